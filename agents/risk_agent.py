@@ -2,13 +2,15 @@
 
 from autogen import AssistantAgent
 
-def risk_agent(config_list):
+from logic.risk_engine import load_risk_rules
+
+def risk_agent(config_list, rules_path: str = None):
+    # Same rules file the deterministic risk engine evaluates
+    rules = load_risk_rules(rules_path)
     return AssistantAgent(
         name="RiskAgent",
         llm_config={"config_list": config_list},
-        system_message="""Analyze risk:
-        - High priority not released: HIGH
-        - Planned delayed: MEDIUM
-        - Released: LOW/NONE
+        system_message=f"""Analyze risk:
+        {rules.describe()}
         Output: Risk levels per feature."""
-    )
\ No newline at end of file
+    )
@@ -13,7 +13,6 @@ import pickle
 import time
 from datetime import datetime
 from dotenv import load_dotenv
-import chromadb
 
 
 import sys, streamlit as st
@@ -28,19 +27,30 @@ from autogen_agentchat.agents import AssistantAgent
 # Local imports
 from db.db_utils import (
     init_db,
-    store_contract_to_db,
-    store_release_to_db,
     load_contracts_for_customer,
     load_all_releases_for_customer,
+    load_customer_names,
+    clear_sales_db,
+    load_risk_trend,
 )
-from rag.rag_engine import ingest_to_vector_db, query_vector_db
-from logic.comparator import compare_features_agent
-from logic.risk_engine import risk_analysis_agent
+from db.connection import get_connection, transaction
+from rag.rag_engine import query_vector_db, get_vector_store, EMBEDDING_BACKEND
+from rag.embedding_cache import get_embedding_cache, get_query_embedding_cache
+from rag.lexical_index import get_lexical_index
+from rag.retrieval_cache import get_retrieval_cache
+from logic.result_memo import memoized_customer_risk, memoized_sales_context, get_result_memo
 from logic.sales_insight import create_sales_insight_agent
-from logic.sales_context import build_sales_context
 from logic.pitch_deck import generate_pitch_deck_content_sync, build_pptx_from_content
-
-from utils.utils import normalize_text, chunk_text
+from logic.ingestion_jobs import (
+    JOB_DONE,
+    JOB_FAILED,
+    enqueue_ingestion,
+    get_job,
+    has_active_jobs,
+    discard_upload,
+    load_upload_preview,
+    recover_interrupted_jobs,
+)
 
 # Suppress noisy logs
 warnings.filterwarnings("ignore")
@@ -143,14 +153,13 @@ st.markdown("""
 # Users are stored in data/users.db. Not production-grade (no rate limiting, etc.)
 # but sufficient for internal sales tool.
 
+USERS_DB_PATH = "data/users.db"
+
 def init_user_db():
     os.makedirs("data", exist_ok=True)
-    conn = sqlite3.connect("data/users.db")
-    c = conn.cursor()
-    c.execute("""CREATE TABLE IF NOT EXISTS users
-                 (username TEXT PRIMARY KEY, password TEXT, name TEXT)""")
-    conn.commit()
-    conn.close()
+    with transaction(USERS_DB_PATH) as conn:
+        conn.execute("""CREATE TABLE IF NOT EXISTS users
+                     (username TEXT PRIMARY KEY, password TEXT, name TEXT)""")
 
 init_user_db()
 
@@ -172,11 +181,9 @@ if not st.session_state.logged_in:
                 user = st.text_input("Username")
                 pw = st.text_input("Password", type="password")
                 if st.form_submit_button("Login"):
-                    conn = sqlite3.connect("data/users.db")
-                    c = conn.cursor()
-                    c.execute("SELECT password FROM users WHERE username=?", (user,))
-                    res = c.fetchone()
-                    conn.close()
+                    res = get_connection(USERS_DB_PATH).execute(
+                        "SELECT password FROM users WHERE username=?", (user,)
+                    ).fetchone()
                     if res and hash_password(pw) == res[0]:
                         st.session_state.logged_in = True
                         st.session_state.username = user
@@ -195,16 +202,13 @@ if not st.session_state.logged_in:
                     elif len(new_pw) < 6:
                         st.error("Password too short")
                     else:
-                        conn = sqlite3.connect("data/users.db")
-                        c = conn.cursor()
                         try:
-                            c.execute("INSERT INTO users VALUES (?, ?, ?)",
-                                      (new_user, hash_password(new_pw), name))
-                            conn.commit()
+                            with transaction(USERS_DB_PATH) as conn:
+                                conn.execute("INSERT INTO users VALUES (?, ?, ?)",
+                                             (new_user, hash_password(new_pw), name))
                             st.success("Account created! Login now.")
                         except sqlite3.IntegrityError:
                             st.error("Username taken")
-                        conn.close()
     st.stop()
 
 # Header
@@ -229,7 +233,7 @@ st.markdown(
     "Close deals with confidence. AI that aligns promises with delivery.</p>",
     unsafe_allow_html=True
 )
-from db.db_utils import init_db, store_contract_to_db
+from db.db_utils import init_db
 
 # Make sure data folder and tables exist
 init_db()
@@ -245,7 +249,7 @@ def load_persistent_state():
         try:
             with open(PERSISTENT_FILE, "rb") as f:
                 state = pickle.load(f)
-                for key in ["uploaded_contracts", "uploaded_releases", "chat_sessions", "current_chat_id", "pitch_deck_path", "pitch_generated", "download_time"]:
+                for key in ["uploaded_contracts", "uploaded_releases", "chat_sessions", "current_chat_id", "pitch_deck_path", "pitch_generated", "download_time", "pending_jobs"]:
                     if key in state:
                         st.session_state[key] = state[key]
         except Exception as e:
@@ -259,7 +263,8 @@ def save_persistent_state():
         "current_chat_id": st.session_state.get("current_chat_id"),
         "pitch_deck_path": st.session_state.get("pitch_deck_path", None),
         "pitch_generated": st.session_state.get("pitch_generated", False),
-        "download_time": st.session_state.get("download_time", None)
+        "download_time": st.session_state.get("download_time", None),
+        "pending_jobs": st.session_state.get("pending_jobs", [])
     }
     os.makedirs("data", exist_ok=True)
     with open(PERSISTENT_FILE, "wb") as f:
@@ -278,6 +283,10 @@ defaults = {
     "uploaded_contracts": [],
     "uploaded_releases": [],
     "selected_risk_level": None,
+    "pending_jobs": [],
+    "ingest_errors": [],
+    # (file name, hash) of uploads whose job failed; not re-queued while still selected
+    "failed_uploads": [],
 
     # 🔔 upload notifications
     "contract_notice_time": None,
@@ -295,6 +304,71 @@ if "existing_data_notice_time" not in st.session_state:
 if "existing_data_toast_time" not in st.session_state:
     st.session_state.existing_data_toast_time = None
 
+# ==================== Background Ingestion ====================
+# Uploads are processed by logic.ingestion_jobs worker threads. Each rerun
+# collects finished jobs into session state so every page sees new data.
+
+recover_interrupted_jobs()
+
+def collect_finished_jobs():
+    landed = False
+    still_pending = []
+    for pending in st.session_state.pending_jobs:
+        job = get_job(pending["job_id"])
+        if job is None:
+            continue  # database was cleared
+        if job["state"] == JOB_DONE:
+            summary = dict(job["result"])
+            summary["preview"] = load_upload_preview(job)
+            entry = (job["file_name"], job["file_hash"], datetime.fromtimestamp(job["updated_at"]), summary)
+            if job["kind"] == "contract":
+                st.session_state.uploaded_contracts = [entry]
+                st.session_state.contract_notice_time = time.time()
+            else:
+                st.session_state.uploaded_releases.append(entry)
+                st.session_state.release_notice_time = time.time()
+            discard_upload(job)
+            if "unchanged" in summary:
+                st.toast(
+                    f"✅ {job['file_name']}: {summary['added']} added, {summary['changed']} changed, "
+                    f"{summary['unchanged']} unchanged"
+                )
+            else:
+                st.toast(
+                    f"✅ {job['file_name']}: {summary['inserted']} rows inserted, {summary['replaced']} replaced"
+                )
+            landed = True
+        elif job["state"] == JOB_FAILED:
+            st.session_state.ingest_errors.append(f"{job['file_name']}: {job['error']}")
+            st.session_state.failed_uploads.append((job["file_name"], job["file_hash"]))
+            discard_upload(job)
+        else:
+            still_pending.append(pending)
+
+    if len(still_pending) != len(st.session_state.pending_jobs):
+        st.session_state.pending_jobs = still_pending
+        if landed and st.session_state.page == "Upload Data":
+            if len(st.session_state.uploaded_contracts) == 1 and len(st.session_state.uploaded_releases) >= 1:
+                st.session_state.page = "Dashboard"
+        save_persistent_state()
+
+collect_finished_jobs()
+
+@st.fragment(run_every=2)
+def ingestion_status():
+    """Poll running jobs without rerunning the page; rerun the app once one finishes"""
+    if not st.session_state.pending_jobs:
+        return
+    st.markdown("### Ingestion")
+    for pending in st.session_state.pending_jobs:
+        job = get_job(pending["job_id"])
+        if job is None or job["state"] in (JOB_DONE, JOB_FAILED):
+            st.rerun()
+        st.progress(
+            min(job["progress"] or 0.0, 1.0),
+            text=f"{job['file_name']} — {job['state']} ({job['rows_done'] or 0:,} rows)"
+        )
+
 # ==================== Sidebar ====================
 with st.sidebar:
     st.markdown("### 🚀 Navigation")
@@ -320,30 +394,61 @@ with st.sidebar:
         nav_button("Uploaded Files", "📁", "Uploaded Files")
 
 
+    ingestion_status()
+
     st.markdown("---")
     st.markdown("### Status")
     if OPENAI_API_KEY:
         st.success("✅ OpenAI Connected")
     else:
         st.error("❌ Add OPENAI_API_KEY to .env")
+    cache_stats = get_embedding_cache().stats()
+    if cache_stats["hits"] or cache_stats["misses"]:
+        st.caption(
+            f"Embedding cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%} saved)"
+        )
+    memo_stats = get_result_memo().stats()
+    if memo_stats["hits"] or memo_stats["misses"]:
+        st.caption(
+            f"Result memo: {memo_stats['hits']} hits / {memo_stats['misses']} misses "
+            f"({memo_stats['hit_rate']:.0%} reused)"
+        )
+    query_stats = get_query_embedding_cache().stats()
+    if query_stats["lookups"]:
+        st.caption(
+            f"Query embeddings: {query_stats['lookups'] - query_stats['network_calls']} of "
+            f"{query_stats['lookups']} served without an API call"
+        )
+    retrieval_stats = get_retrieval_cache().stats()
+    if retrieval_stats["hits"] or retrieval_stats["misses"]:
+        st.caption(
+            f"Retrieval cache: {retrieval_stats['hits']} hits / {retrieval_stats['misses']} misses "
+            f"({retrieval_stats['hit_rate']:.0%} reused)"
+        )
     has_contract = len(st.session_state.uploaded_contracts) == 1
     has_releases = len(st.session_state.uploaded_releases) >= 1
     data_fully_loaded = has_contract and has_releases
     if data_fully_loaded:
         st.success("✅ Data Loaded")
-        if st.button("🗑️ Clear All Data", type="primary"):
-            keys_to_clear = ["chat_sessions", "current_chat_id", "pitch_deck_path", "pitch_generated", "download_time", "uploaded_contracts", "uploaded_releases", "page", "selected_risk_level"]
+        # Dropping the tables under a running job would let it write cleared data back
+        jobs_active = bool(st.session_state.pending_jobs) or has_active_jobs()
+        if jobs_active:
+            st.caption("Clear All Data is available once the running uploads finish.")
+        if st.button("🗑️ Clear All Data", type="primary", disabled=jobs_active):
+            keys_to_clear = ["chat_sessions", "current_chat_id", "pitch_deck_path", "pitch_generated", "download_time", "uploaded_contracts", "uploaded_releases", "page", "selected_risk_level", "pending_jobs", "ingest_errors", "failed_uploads"]
             for k in keys_to_clear:
                 if k in st.session_state:
                     del st.session_state[k]
-            if os.path.exists("data/sales.db"):
-                os.remove("data/sales.db")
-            if os.path.exists("data/chroma"):
-                try:
-                    import shutil
-                    shutil.rmtree("data/chroma")
-                except Exception as e:
-                    st.warning(f"Chroma cleanup issue: {e}")
+            clear_sales_db()
+            # Data versions restart at 0 with the fresh schema
+            get_result_memo().clear()
+            get_lexical_index().clear()
+            # Through the shared client: removing data/chroma under it breaks later writes
+            try:
+                get_vector_store().clear()
+            except Exception as e:
+                st.warning(f"Chroma cleanup issue: {e}")
             if os.path.exists(PERSISTENT_FILE):
                 os.remove(PERSISTENT_FILE)
             st.rerun()
@@ -387,14 +492,13 @@ def build_executive_summary(customer_name: str, contract_df: pd.DataFrame, relea
 # ChromaDB persistent client stored in data/chroma
 # Uses OpenAI's text-embedding-3-small for cost-efficient embeddings
 # All contract and release chunks are ingested with metadata for retrieval
-# (Chunks created in upload processing via ingest_to_vector_db calls)
+# (Chunks created in upload processing via logic.ingestion.ingest_csv_stream)
   # ==================== Initialization ====================
 # ==================== Initialization ====================
 
 import os
 from dotenv import load_dotenv
 import streamlit as st
-import chromadb
 from openai import OpenAI
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 
@@ -402,42 +506,26 @@ from autogen_ext.models.openai import OpenAIChatCompletionClient
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Stop if API key is missing
+# Stop if API key is missing (local embeddings keep the dashboard and uploads working)
 if not OPENAI_API_KEY:
-    st.error("Missing OPENAI_API_KEY in .env")
-    st.stop()
+    if EMBEDDING_BACKEND != "local":
+        st.error("Missing OPENAI_API_KEY in .env (or set EMBEDDING_BACKEND=local)")
+        st.stop()
+    st.warning("OPENAI_API_KEY is not set: using local embeddings; chat and pitch decks are unavailable.")
 
 # ------------------ Initialize local storage ------------------
 os.makedirs("data", exist_ok=True)  # Create data folder if missing
 
-# ------------------ ChromaDB vector client ------------------
-vector_client = chromadb.PersistentClient(path="data/chroma")
-
-# ------------------ Custom embedding function ------------------
-from chromadb.api.types import EmbeddingFunction
-
-class OpenAIEmbedding(EmbeddingFunction):
-    """Custom embedding function compatible with ChromaDB v0.4.24+"""
-    def __init__(self, model_name="text-embedding-3-small"):
-        self.model_name = model_name
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
-
-    def __call__(self, input):
-        # input: list of strings
-        response = self.client.embeddings.create(
-            model=self.model_name,
-            input=input
-        )
-        return [item.embedding for item in response.data]
-
-# Initialize embedding function
-embedding_func = OpenAIEmbedding(model_name="text-embedding-3-small")
+# ------------------ ChromaDB vector store ------------------
+# One lazily built client/collection per process, shared with ingestion and retrieval
+# (EMBEDDING_BACKEND picks OpenAI or local sentence-transformers)
+vector_store = get_vector_store()
 
 # ------------------ OpenAI Chat Client ------------------
 model_client = OpenAIChatCompletionClient(
     model="gpt-4o-mini",
     api_key=OPENAI_API_KEY
-)
+) if OPENAI_API_KEY else None
 
 
 
@@ -447,9 +535,12 @@ model_client = OpenAIChatCompletionClient(
 # - RiskAgent: assigns risk levels (HIGH/MEDIUM/LOW/NONE) based on delivery gaps
 # - PitchDeckAgent: generates structured pitch deck content (title, slides, speaker notes)
 
-comparison_agent = AssistantAgent(name="ComparisonAgent", model_client=model_client)
-risk_agent = AssistantAgent(name="RiskAgent", model_client=model_client)
-pitch_agent = AssistantAgent(name="PitchDeckAgent", model_client=model_client)
+if model_client is not None:
+    comparison_agent = AssistantAgent(name="ComparisonAgent", model_client=model_client)
+    risk_agent = AssistantAgent(name="RiskAgent", model_client=model_client)
+    pitch_agent = AssistantAgent(name="PitchDeckAgent", model_client=model_client)
+else:
+    comparison_agent = risk_agent = pitch_agent = None
 
 def run_agent_sync(agent: AssistantAgent, task: str) -> str:
     resp = asyncio.run(agent.run(task=task))
@@ -471,6 +562,16 @@ def get_file_hash(file) -> str:
     file.seek(0)
     return hashlib.sha256(content).hexdigest()
 
+def describe_upload(data) -> tuple:
+    """
+    Return (row count, customer names, preview DataFrame) for an uploaded-file entry.
+    Streamed uploads keep a summary dict; older persisted state holds the full DataFrame.
+    """
+    if isinstance(data, pd.DataFrame):
+        customers = data["customer_name"].dropna().unique().tolist() if "customer_name" in data.columns else []
+        return len(data), customers, data
+    return data["rows"], data["customers"], data["preview"]
+
 # ==================== Upload Data Page ====================
 # Enforces strict rules:
 #   • Exactly ONE customer contract CSV
@@ -516,7 +617,9 @@ if st.session_state.page == "Upload Data":
     # ---- Notification placeholder (below upload section) ----
     notice_container = st.container()
 
-    processed = False  # Flag to detect if any new upload happened
+    pending_hashes = {p["file_hash"] for p in st.session_state.pending_jobs}
+    # A failed file stays in its uploader; re-queuing it on every rerun would loop
+    failed_uploads = set(st.session_state.failed_uploads)
 
     if contract_file:
         file_hash = get_file_hash(contract_file)
@@ -524,34 +627,23 @@ if st.session_state.page == "Upload Data":
             name == contract_file.name and h == file_hash
             for name, h, _, _ in st.session_state.uploaded_contracts
         )
-        if duplicate:
+        contract_pending = any(p["kind"] == "contract" for p in st.session_state.pending_jobs)
+        if file_hash in pending_hashes:
+            pass  # already queued; the sidebar shows its progress
+        elif (contract_file.name, file_hash) in failed_uploads:
+            pass  # already reported; waits for a different file
+        elif duplicate:
             st.session_state.single_contract_warn_time = time.time()
         else:
-            if len(st.session_state.uploaded_contracts) >= 1:
+            if len(st.session_state.uploaded_contracts) >= 1 or contract_pending:
                 st.session_state.single_contract_warn_time = time.time()
             else:
-                with st.spinner("Processing contract..."):
-                    df = pd.read_csv(contract_file)
-                    required = ["customer_name", "feature_id", "feature_name", "description", "priority"]
-                    if not all(c in df.columns for c in required):
-                        st.error(f"Missing columns. Need: {', '.join(required)}")
-                    else:
-                        for _, row in df.iterrows():
-                            store_contract_to_db(row.to_dict())
-                            text = normalize_text(
-                                f"Contract: {row['feature_name']} — {row['description']} (Priority: {row['priority']})"
-                            )
-                            for chunk in chunk_text(text):
-                                ingest_to_vector_db(
-                                    vector_client, embedding_func, chunk,
-                                    {"type": "contract", "customer_name": row["customer_name"], "feature_id": row["feature_id"]}
-                                )
-                        timestamp = datetime.now()
-                        st.session_state.uploaded_contracts = [(contract_file.name, file_hash, timestamp, df.copy())]
-                        st.success("Contract uploaded successfully!")
-                        st.session_state.contract_notice_time = time.time()
-                        save_persistent_state()
-                        processed = True  # Mark as processed
+                job_id = enqueue_ingestion(contract_file.name, contract_file.getvalue(), file_hash, "contract")
+                st.session_state.pending_jobs.append(
+                    {"job_id": job_id, "kind": "contract", "file_hash": file_hash}
+                )
+                save_persistent_state()
+                st.rerun()
 
     if release_file:
         file_hash = get_file_hash(release_file)
@@ -559,44 +651,28 @@ if st.session_state.page == "Upload Data":
             name == release_file.name and h == file_hash
             for name, h, _, _ in st.session_state.uploaded_releases
         )
-        if duplicate:
+        if file_hash in pending_hashes:
+            pass  # already queued; the sidebar shows its progress
+        elif (release_file.name, file_hash) in failed_uploads:
+            pass  # already reported; waits for a different file
+        elif duplicate:
             st.session_state.release_notice_time = time.time()
         else:
-            with st.spinner("Processing releases..."):
-                df = pd.read_csv(release_file)
-                required = ["customer_name", "feature_id", "feature_name", "status"]
-                if not all(c in df.columns for c in required):
-                    st.error(f"Missing columns. Need: {', '.join(required)}")
-                else:
-                    for _, row in df.iterrows():
-                        store_release_to_db(row.to_dict())
-                        text = normalize_text(
-                            f"Release: {row['feature_name']} — Status: {row['status']}"
-                        )
-                        for chunk in chunk_text(text):
-                            ingest_to_vector_db(
-                                vector_client, embedding_func, chunk,
-                                {"type": "release", "customer_name": row["customer_name"], "feature_id": row["feature_id"]}
-                            )
-                    timestamp = datetime.now()
-                    st.session_state.uploaded_releases.append(
-                        (release_file.name, file_hash, timestamp, df.copy())
-                    )
-                    st.success("Release file uploaded successfully!")
-                    st.session_state.release_notice_time = time.time()
-                    save_persistent_state()
-                    processed = True  # Mark as processed
-
-    # After any processing, check if now ready and redirect
-    if processed:
-        has_contract = len(st.session_state.uploaded_contracts) == 1
-        has_releases = len(st.session_state.uploaded_releases) >= 1
-        if has_contract and has_releases:
-            st.success("✅ Data uploaded successfully! Redirecting to Dashboard...")
-            st.session_state.page = "Dashboard"
+            job_id = enqueue_ingestion(release_file.name, release_file.getvalue(), file_hash, "release")
+            st.session_state.pending_jobs.append(
+                {"job_id": job_id, "kind": "release", "file_hash": file_hash}
+            )
             save_persistent_state()
             st.rerun()
-            st.stop()
+
+    # ---- Queued / running ingestion jobs ----
+    if st.session_state.pending_jobs:
+        st.info("⏳ Files are being processed in the background. You can keep using the app; "
+                "the Dashboard updates automatically when processing finishes.")
+
+    for message in st.session_state.ingest_errors:
+        st.error(f"Upload failed — {message}")
+    st.session_state.ingest_errors = []
 
     with notice_container:
         # ---- Contract loaded notification (10s) ----
@@ -657,7 +733,8 @@ elif st.session_state.page == "Uploaded Files":
         st.info("No files uploaded yet. Visit **Upload Data** to get started!")
     else:
         if st.session_state.uploaded_contracts:
-            name, _, ts, df = st.session_state.uploaded_contracts[0]
+            name, _, ts, data = st.session_state.uploaded_contracts[0]
+            row_count, upload_customers, df = describe_upload(data)
             with st.container(border=True):
                 st.markdown(f"""
                 <div style='background: linear-gradient(135deg, #a855f7, #9333ea);
@@ -673,7 +750,7 @@ elif st.session_state.page == "Uploaded Files":
                     st.markdown(f"<small style='color:#d8b4fe;'>**File:** <code style='background:#1e293b; padding:2px 6px; border-radius:4px; font-size:0.8rem;'>{name}</code></small>", unsafe_allow_html=True)
                 with col2:
                     st.markdown(f"<small style='color:#d8b4fe;'>📅 {ts.strftime('%b %d, %Y ⋅ %H:%M')}</small>", unsafe_allow_html=True)
-                st.markdown(f"<small style='color:#d8b4fe;'>📊 {len(df)} rows • {df['customer_name'].nunique()} customer(s)</small>", unsafe_allow_html=True)
+                st.markdown(f"<small style='color:#d8b4fe;'>📊 {row_count:,} rows • {len(upload_customers)} customer(s)</small>", unsafe_allow_html=True)
                 with st.expander("👁️ View Contract Data", expanded=False):
                     st.dataframe(df, use_container_width=True, hide_index=True)
 
@@ -682,7 +759,8 @@ elif st.session_state.page == "Uploaded Files":
             st.markdown("<small style='color:#e9d5ff;'>All features tracked and ready</small>", unsafe_allow_html=True)
             cols = st.columns(min(3, len(st.session_state.uploaded_releases)))
             purple_shades = ["#c084fc", "#a855f7", "#9333ea", "#7c3aed", "#6d28d9"]
-            for idx, (name, _, ts, df) in enumerate(st.session_state.uploaded_releases):
+            for idx, (name, _, ts, data) in enumerate(st.session_state.uploaded_releases):
+                row_count, _, df = describe_upload(data)
                 color = purple_shades[idx % len(purple_shades)]
                 with cols[idx % 3]:
                     with st.container(border=True):
@@ -696,45 +774,47 @@ elif st.session_state.page == "Uploaded Files":
                         </div>
                         """, unsafe_allow_html=True)
                         st.markdown(f"<small style='color:#d8b4fe;'>📅 {ts.strftime('%b %d, %Y ⋅ %H:%M')}</small>", unsafe_allow_html=True)
-                        st.markdown(f"<small style='color:#d8b4fe;'>✨ {len(df)} features</small>", unsafe_allow_html=True)
+                        st.markdown(f"<small style='color:#d8b4fe;'>✨ {row_count:,} features</small>", unsafe_allow_html=True)
+                        if isinstance(data, dict) and "unchanged" in data:
+                            st.markdown(
+                                f"<small style='color:#d8b4fe;'>➕ {data['added']:,} added • "
+                                f"🔁 {data['changed']:,} changed • ⏸ {data['unchanged']:,} unchanged</small>",
+                                unsafe_allow_html=True
+                            )
                         with st.expander("👁️ View Data", expanded=False):
                             st.dataframe(df, use_container_width=True, hide_index=True)
 
 else:
     customers = set()
-    conn = sqlite3.connect("data/sales.db")
-    cur = conn.cursor()
     try:
-        cur.execute("SELECT DISTINCT customer_name FROM customers")
-        for row in cur.fetchall():
-            customers.add(row[0])
-    except:
+        customers.update(load_customer_names())
+    except sqlite3.Error:
         pass
-    conn.close()
 
-    for _, _, _, df in st.session_state.uploaded_contracts:
-        if "customer_name" in df.columns:
-            customers.update(df["customer_name"].unique())
+    for _, _, _, data in st.session_state.uploaded_contracts:
+        customers.update(describe_upload(data)[1])
 
     customers = sorted(list(customers))
+    if st.session_state.pending_jobs:
+        st.info("⏳ New data is being processed in the background — this view refreshes when it finishes.")
     if not customers:
-        st.warning("No customers found. Please upload contract data first.")
+        if not st.session_state.pending_jobs:
+            st.warning("No customers found. Please upload contract data first.")
         st.stop()
 
     customer = st.selectbox("👤 Select Customer", customers)
-    contract_df = load_contracts_for_customer(customer)
-    release_df = load_all_releases_for_customer(customer)
 
     # ---- SHARED COMPUTED TRUTH (Dashboard + Chat) ----
-    comparison = compare_features_agent(comparison_agent, contract_df, release_df)
-    risk_data = risk_analysis_agent(risk_agent, comparison)
+    # Read from the snapshot materialized at ingest time; raw contract/release
+    # rows are only loaded where a page actually needs them.
+    comparison, risk_data = memoized_customer_risk(customer)
     
 # ==================== Dashboard Page ====================
 # Main analysis view for the selected customer.
-# Shared computed truth:
-#   • comparison = compare_features_agent(...) → feature matching table
-#   • risk_data = risk_analysis_agent(...) → risk counts + summary_table
-# These results are computed once and reused in both Dashboard and Chat pages.
+# Shared computed truth (logic.result_memo.memoized_customer_risk):
+#   • comparison → feature matching table (compare_features_agent at ingest time)
+#   • risk_data → risk counts + summary_table (risk_analysis_agent at ingest time)
+# These results are read once per rerun and reused in both Dashboard and Chat pages.
 
 
 # Features:
@@ -840,6 +920,29 @@ else:
                 st.session_state.selected_risk_level = None
                 st.rerun()
 
+        # ---- Risk trend (one point per ingest, from risk_history) ----
+        with st.expander("📈 Risk Trend", expanded=False):
+            today = datetime.now().date()
+            trend_range = st.date_input(
+                "Date range",
+                value=(today - pd.Timedelta(weeks=12), today),
+                key="risk_trend_range"
+            )
+            if isinstance(trend_range, (tuple, list)) and len(trend_range) == 2:
+                trend_start, trend_end = trend_range
+                trend = load_risk_trend(
+                    customer,
+                    start=pd.Timestamp(trend_start),
+                    end=pd.Timestamp(trend_end) + pd.Timedelta(days=1)
+                )
+                if len(trend) < 2:
+                    st.caption("The trend fills in as new contract and release files are ingested.")
+                else:
+                    st.line_chart(
+                        trend.set_index("recorded_at")[["HIGH", "MEDIUM", "LOW"]],
+                        color=["#dc2626", "#d97706", "#059669"]
+                    )
+
         summary_table = risk_data["summary_table"].copy()
         possible_cols = ["risk", "risk_level", "Risk Level", "Risk", "risk_category", "level"]
         risk_col = next((col for col in possible_cols if col in summary_table.columns), None)
@@ -877,15 +980,16 @@ else:
                 "✨ Generate AI Sales Pitch Deck",
                 type="primary",
                 use_container_width=True,
-                key="generate_pitch_deck_btn"
+                key="generate_pitch_deck_btn",
+                disabled=pitch_agent is None
             ):
                 with st.spinner("Crafting professional pitch deck and summary... This may take 20–40 seconds."):
                     try:
                         content = generate_pitch_deck_content_sync(
                             pitch_agent,
                             customer,
-                            vector_client,
-                            embedding_func,
+                            vector_store.client,
+                            vector_store.embedding_func,
                             comparison,
                             risk_data
                         )
@@ -897,7 +1001,10 @@ else:
                         st.session_state.pitch_generated = True
                         
                         st.session_state.executive_summary = build_executive_summary(
-                            customer, contract_df, release_df, risk_data
+                            customer,
+                            load_contracts_for_customer(customer),
+                            load_all_releases_for_customer(customer),
+                            risk_data
                         )
                         st.session_state.executive_summary_visible = True
                         
@@ -1158,12 +1265,12 @@ else:
 
                 # Generate assistant response
                 with st.spinner("Thinking..."):
-                    sales_context = build_sales_context(
-                        contract_df, release_df, comparison, risk_data
-                    )
+                    sales_context = memoized_sales_context(customer)
 
                     if not sales_context.strip():
                         response = "Not found in provided contract or release data."
+                    elif not OPENAI_API_KEY:
+                        response = "The sales assistant needs OPENAI_API_KEY in .env."
                     else:
                         agent = create_sales_insight_agent()
                         task_prompt = f"""
@@ -0,0 +1,116 @@
+# benchmarks/bench_context_selection.py
+# Pitch-deck prompt context: the previous top-12 chunks joined and cut at 6000
+# characters vs. select_context (MMR + near-duplicate suppression under
+# CONTEXT_TOKEN_BUDGET) over the same 12 candidates. The corpus is what repeated
+# uploads leave behind: each contract is re-uploaded with a changed priority or
+# delivery quarter, and each feature appears in several release files with
+# slightly different status wording. Every revision is a distinct chunk.
+# The offline hashing embedder scores near-duplicates lower than a real model,
+# hence its lower duplicate threshold.
+#
+#   python -m benchmarks.bench_context_selection [--backend hashing|openai|local]
+
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_retrieval import ADJECTIVES, NOUNS, HashingEmbedding
+from logic.ingestion import contract_vector_chunks, release_vector_chunks
+from rag.embedding_dispatcher import estimate_tokens
+from rag.rag_engine import (
+    CONTEXT_TOKEN_BUDGET, NEAR_DUPLICATE_SIMILARITY, PREVIOUS_CONTEXT_CHARS,
+    get_embedding_function, select_context
+)
+
+CONTEXT_QUERY = "strategic overview contract commitments roadmap delivery status risks value proposition"
+N_FEATURES = 10
+CONTRACT_REVISIONS = 3
+RELEASE_FILES = 6
+RELEASED_WORDING = ["Released", "released ", "Live", "Done", "Completed"]
+QUARTERS = ["Q1", "Q2", "Q3", "Q4"]
+
+
+def contract_description(name: str, team: str, quarter: str) -> str:
+    """About 400 characters, like a real contract line item"""
+    return (
+        f"{name} for the {team} team. The customer relies on it for their quarterly "
+        f"roadmap review and expects delivery in {quarter} as part of the renewal "
+        f"commitments. Scope covers configuration, permissions, audit trail and export "
+        f"of the {team} data, with onboarding for up to fifty users. Acceptance "
+        f"requires a working demo in the customer's staging environment."
+    )
+
+
+def make_chunks(seed: int = 3) -> list:
+    rng = random.Random(seed)
+    names = [f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}" for i in range(N_FEATURES)]
+    teams = [rng.choice(NOUNS).lower() for _ in names]
+    # Each contract upload revises some priorities and delivery quarters
+    contracts = pd.DataFrame([
+        {"customer_name": "Acme", "feature_id": f"F-{i}", "feature_name": name,
+         "description": contract_description(name, teams[i], rng.choice(QUARTERS)),
+         "priority": rng.choice(["High", "Medium", "Low"])}
+        for _ in range(CONTRACT_REVISIONS) for i, name in enumerate(names)
+    ])
+    releases = pd.DataFrame([
+        {"customer_name": "Acme", "feature_id": f"F-{i}", "feature_name": name,
+         "status": rng.choice(RELEASED_WORDING) if i % 2 else "Planned"}
+        for _ in range(RELEASE_FILES) for i, name in enumerate(names)
+    ])
+    docs = {}
+    for texts, metas in (contract_vector_chunks(contracts), release_vector_chunks(releases)):
+        # Ingestion stores each distinct text once (content-hash ids)
+        for text, meta in zip(texts, metas):
+            docs.setdefault(text, {"text": text, "metadata": meta})
+    return list(docs.values())
+
+
+def ranked(docs: list, embedding_func, n: int) -> list:
+    """Top-n docs by cosine similarity to the context query, like a dense retrieval"""
+    vectors = np.asarray(embedding_func([d["text"] for d in docs]), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query = np.asarray(embedding_func([CONTEXT_QUERY])[0], dtype=np.float32)
+    order = np.argsort(-(vectors @ (query / np.linalg.norm(query))))
+    return [docs[i] for i in order[:n]]
+
+
+def describe(label: str, docs: list, context: str):
+    features = {d["metadata"]["feature_id"] for d in docs}
+    print(f"  {label:<34} {len(docs):>6} {len(features):>9} {estimate_tokens(context):>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="hashing", choices=["hashing", "openai", "local"])
+    args = parser.parse_args(argv)
+    if args.backend == "hashing":
+        embedding_func, duplicate_similarity = HashingEmbedding(), 0.8
+    else:
+        embedding_func, duplicate_similarity = get_embedding_function(args.backend), NEAR_DUPLICATE_SIMILARITY
+
+    docs = make_chunks()
+    print(f"{len(docs)} distinct chunks for one customer, budget {CONTEXT_TOKEN_BUDGET} tokens\n")
+    print(f"  {'':<34} {'chunks':>6} {'features':>9} {'~tokens':>8}")
+
+    candidates = ranked(docs, embedding_func, 12)
+    old_context = "\n\n".join(d["text"] for d in candidates)[:PREVIOUS_CONTEXT_CHARS]
+    # Only chunks that survive the cut reach the prompt whole
+    describe(f"top 12, cut at {PREVIOUS_CONTEXT_CHARS} chars",
+             [d for d in candidates if d["text"] in old_context], old_context)
+
+    start = time.perf_counter()
+    chosen, stats = select_context(
+        CONTEXT_QUERY, candidates, embedding_func, duplicate_similarity=duplicate_similarity
+    )
+    elapsed = time.perf_counter() - start
+    describe("top 12 -> select_context", chosen, "\n\n".join(d["text"] for d in chosen))
+
+    print(f"\nselect_context: {stats['duplicates']} near-duplicates dropped, {stats['over_budget']} over budget, "
+          f"~{stats['tokens_saved']} of {stats['previous_tokens']} prompt tokens saved, {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/bench_embedding_dispatcher.py
+# Throughput of AsyncEmbeddingDispatcher against the local fake embeddings server,
+# called directly and through the real ingest path (ingest_batch_to_vector_db into a
+# throwaway Chroma store) compared with embedding each add-sized batch in turn.
+#
+#   python -m benchmarks.bench_embedding_dispatcher
+
+import os
+import tempfile
+import time
+
+from benchmarks.fake_embeddings_server import FakeEmbeddingsServer, fake_vector
+from rag import lexical_index
+from rag.embedding_cache import EmbeddingCache
+from rag.embedding_dispatcher import AsyncEmbeddingDispatcher
+from rag.rag_engine import EMBED_BATCH_SIZE, OpenAIEmbedding, VectorStore, ingest_batch_to_vector_db
+
+N_TEXTS = 5000
+
+
+def run(server, concurrency, **kwargs):
+    texts = [f"release: feature {i} — status: released" for i in range(N_TEXTS)]
+    dispatcher = AsyncEmbeddingDispatcher(
+        "fake-embedding", api_key="test", base_url=server.base_url,
+        concurrency=concurrency, requests_per_minute=100_000, tokens_per_minute=50_000_000,
+        base_backoff=0.05, **kwargs
+    )
+    start = time.perf_counter()
+    vectors = dispatcher.embed(texts)
+    elapsed = time.perf_counter() - start
+
+    assert all(v == fake_vector(t) for v, t in zip(vectors, texts)), "vectors out of order"
+    stats = dispatcher.stats()
+    print(
+        f"concurrency={concurrency:<3} {N_TEXTS / elapsed:8.0f} texts/s  "
+        f"requests={stats['requests']:<4} retries={stats['retries']:<3} "
+        f"final_batch={stats['batch_size']:<4} avg_latency={stats['avg_latency'] * 1000:.0f}ms"
+    )
+
+
+def run_ingest(server, tmp: str, per_batch: bool):
+    """Ingest one streamed chunk's worth of texts; per_batch embeds each add-sized batch in turn"""
+    texts = [f"release: feature {i} — status: {'serial' if per_batch else 'concurrent'}" for i in range(N_TEXTS)]
+    metadatas = [{"type": "release", "customer_name": f"Customer {i % 20}"} for i in range(N_TEXTS)]
+    label = "per-batch" if per_batch else "concurrent"
+    embedding = OpenAIEmbedding("fake-embedding", cache=EmbeddingCache(os.path.join(tmp, f"cache-{label}.db")))
+    embedding.dispatcher = AsyncEmbeddingDispatcher(
+        "fake-embedding", api_key="test", base_url=server.base_url,
+        requests_per_minute=100_000, tokens_per_minute=50_000_000
+    )
+    store = VectorStore(path=os.path.join(tmp, f"chroma-{label}"), embedding_func=embedding)
+    before = server.requests
+
+    start = time.perf_counter()
+    if per_batch:
+        for i in range(0, N_TEXTS, EMBED_BATCH_SIZE):
+            part = slice(i, i + EMBED_BATCH_SIZE)
+            ingest_batch_to_vector_db(store, None, texts[part], metadatas[part])
+    else:
+        ingest_batch_to_vector_db(store, None, texts, metadatas)
+    elapsed = time.perf_counter() - start
+
+    assert store.collection.count() == N_TEXTS
+    print(f"{label:<11} {N_TEXTS / elapsed:8.0f} texts/s  requests={server.requests - before}")
+
+
+def main():
+    print("Clean server")
+    with FakeEmbeddingsServer(latency=0.05) as server:
+        for concurrency in (1, 4, 8):
+            run(server, concurrency, max_batch_size=64)
+
+    print("\nServer injecting 10% 429s and 5% 500s")
+    with FakeEmbeddingsServer(latency=0.05, rate_limit_ratio=0.10, server_error_ratio=0.05) as server:
+        for concurrency in (1, 4, 8):
+            run(server, concurrency, max_batch_size=64, max_retries=20)
+
+    print(f"\nIngest path, {N_TEXTS} texts, Chroma adds of {EMBED_BATCH_SIZE}")
+    with FakeEmbeddingsServer(latency=0.05) as server, tempfile.TemporaryDirectory() as tmp:
+        # Keep the shared lexical index out of data/
+        lexical_index._shared_index = lexical_index.LexicalIndex(os.path.join(tmp, "lexical.db"))
+        for per_batch in (True, False):
+            run_ingest(server, tmp, per_batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_portfolio_risk.py
+# Portfolio batch engine vs. the per-customer pipeline (compute_customer_risk in a loop),
+# on a throwaway database, with a per-customer parity check.
+#
+#   python -m benchmarks.bench_portfolio_risk
+
+import os
+import time
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import db.db_utils as db_utils
+from logic.portfolio_risk import compute_portfolio_risk
+from logic.risk_snapshot import compute_customer_risk
+
+N_CUSTOMERS = 300
+FEATURES_PER_CUSTOMER = 60
+RELEASE_ROWS_PER_CUSTOMER = 120
+STATUSES = ["Released", "Done", "Planned", "planned", "In Progress", "Blocked", ""]
+
+
+def populate(seed: int = 3):
+    rng = np.random.default_rng(seed)
+    contracts, releases = [], []
+    for c in range(N_CUSTOMERS):
+        name = f"Customer {c:03d}"
+        for f in rng.choice(FEATURES_PER_CUSTOMER * 2, FEATURES_PER_CUSTOMER, replace=False):
+            contracts.append({
+                "customer_name": name, "feature_id": f"F-{f}", "feature_name": f"Feature {f}",
+                "description": "desc", "priority": rng.choice(["High", "Medium", "Low"]),
+            })
+        for f in rng.integers(0, FEATURES_PER_CUSTOMER * 2, RELEASE_ROWS_PER_CUSTOMER):
+            releases.append({
+                "customer_name": name, "feature_id": f"F-{f}", "feature_name": f"Feature {f}",
+                "status": rng.choice(STATUSES),
+            })
+    # A customer with releases but no contract shows up with zero counts
+    releases.append({"customer_name": "Prospect", "feature_id": "F-1", "feature_name": "x", "status": "Planned"})
+
+    db_utils.store_contracts_to_db(pd.DataFrame(contracts))
+    db_utils.store_releases_to_db(pd.DataFrame(releases), source_file="bench.csv")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = os.path.join(tmp, "sales.db")
+        db_utils.init_db()
+        populate()
+        customers = sorted(db_utils.load_customer_names())
+
+        start = time.perf_counter()
+        per_customer = {name: compute_customer_risk(name)[1] for name in customers}
+        t_loop = time.perf_counter() - start
+
+        start = time.perf_counter()
+        frame, rollups = compute_portfolio_risk()
+        t_batch = time.perf_counter() - start
+
+        by_customer = dict(tuple(frame.groupby("customer_name", sort=False)))
+        rollups = rollups.set_index("customer_name")
+        for name, risk_data in per_customer.items():
+            expected = risk_data["summary_table"].reset_index(drop=True)
+            got = by_customer.get(name, frame.iloc[:0]).drop(columns="customer_name").reset_index(drop=True)
+            if expected.empty:
+                assert got.empty, name
+            else:
+                pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+            for level in db_utils.RISK_LEVELS:
+                assert rollups.loc[name, level] == risk_data[level], (name, level)
+
+    print(f"{len(customers)} customers, {len(frame):,} contract features — outputs identical")
+    print(f"  per-customer loop : {t_loop * 1000:8.1f} ms")
+    print(f"  portfolio batch   : {t_batch * 1000:8.1f} ms  ({t_loop / t_batch:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_retrieval.py
+# Latency and recall@k of dense, lexical and hybrid retrieval (hybrid_search) on a
+# synthetic contract/release corpus, for exact-ID questions and feature-name questions.
+# Uses a throwaway Chroma collection and lexical index; the default "hashing"
+# embedder needs no network, --backend openai/local measures a real model.
+# --sharding customer/bucket splits the collection as VECTOR_SHARDING would.
+#
+#   python -m benchmarks.bench_retrieval [--backend hashing|openai|local] [--sharding none|customer|bucket]
+
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+import pandas as pd
+
+from logic.ingestion import contract_vector_chunks, release_vector_chunks
+from rag.lexical_index import LexicalIndex
+from rag.rag_engine import RETRIEVAL_MODES, get_embedding_function, hybrid_search
+from rag.vector_shards import SHARDING_MODES, ShardedCollection
+
+N_CUSTOMERS = 20
+FEATURES_PER_CUSTOMER = 150
+N_QUERIES = 200
+TOP_K = 5
+
+ADJECTIVES = ["Advanced", "Realtime", "Secure", "Automated", "Custom", "Bulk", "Smart", "Unified"]
+NOUNS = ["Reporting", "Export", "Billing", "Alerts", "Dashboard", "Audit Log", "SSO", "Forecasting",
+         "Inventory Sync", "Approval Flow", "Data Retention", "API Access"]
+
+
+class HashingEmbedding:
+    """Offline bag-of-words embedder (hashed tokens, L2-normalized)"""
+    model_name = "bench-hashing-256"
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            v = np.zeros(256, dtype=np.float32)
+            for token in text.lower().split():
+                v[int(hashlib.md5(token.encode()).hexdigest(), 16) % 256] += 1.0
+            vectors.append((v / (np.linalg.norm(v) or 1.0)).tolist())
+        return vectors
+
+
+def make_corpus(seed: int = 5):
+    rng = random.Random(seed)
+    contracts, releases = [], []
+    for c in range(N_CUSTOMERS):
+        for f in rng.sample(range(FEATURES_PER_CUSTOMER * 3), FEATURES_PER_CUSTOMER):
+            name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {f}"
+            contracts.append({
+                "customer_name": f"Customer {c}", "feature_id": f"F-{f}", "feature_name": name,
+                "description": f"{name} for the {rng.choice(NOUNS).lower()} team", "priority": rng.choice(["High", "Low"]),
+            })
+            releases.append({
+                "customer_name": f"Customer {c}", "feature_id": f"F-{f}", "feature_name": name,
+                "status": rng.choice(["Released", "Planned", "In Progress"]),
+            })
+    texts, metadatas = contract_vector_chunks(pd.DataFrame(contracts))
+    more_texts, more_metas = release_vector_chunks(pd.DataFrame(releases))
+    return contracts, texts + more_texts, metadatas + more_metas
+
+
+def make_queries(contracts, seed: int = 9):
+    rng = random.Random(seed)
+    queries = []
+    for row in rng.sample(contracts, N_QUERIES):
+        key = (row["customer_name"], row["feature_id"])
+        queries.append(("id", f"is {row['feature_id']} live yet?", key))
+        queries.append(("name", f"what is the status of {row['feature_name']}?", key))
+    return queries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", default="hashing", choices=["hashing", "openai", "local"])
+    parser.add_argument("--sharding", default="none", choices=SHARDING_MODES)
+    args = parser.parse_args(argv)
+    embedding_func = HashingEmbedding() if args.backend == "hashing" else get_embedding_function(args.backend)
+
+    contracts, texts, metadatas = make_corpus()
+    ids = [hashlib.sha256(t.encode("utf-8")).hexdigest() for t in texts]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "chroma"))
+        if args.sharding == "none":
+            collection = client.get_or_create_collection(name="bench_retrieval", embedding_function=embedding_func)
+        else:
+            collection = ShardedCollection(client, embedding_func, "bench_retrieval", args.sharding, buckets=4)
+        index = LexicalIndex(os.path.join(tmp, "lexical.db"))
+        for start in range(0, len(texts), 256):
+            part = slice(start, start + 256)
+            collection.add(documents=texts[part], metadatas=metadatas[part], ids=ids[part])
+            index.add(texts[part], metadatas[part], ids[part])
+        # recall = share of questions whose feature is among the top-k chunks of that customer
+        print(f"{len(texts):,} chunks, sharding={args.sharding}, {N_QUERIES} questions per kind, recall@{TOP_K}\n")
+
+        queries = make_queries(contracts)
+        print(f"{'mode':<8} {'kind':<5} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode in RETRIEVAL_MODES:
+            for kind in ("id", "name"):
+                latencies, recalls = [], []
+                for _, query, key in (q for q in queries if q[0] == kind):
+                    start = time.perf_counter()
+                    results = hybrid_search(
+                        collection, index, embedding_func, query,
+                        customer_filter=key[0], n_results=TOP_K, mode=mode
+                    )
+                    latencies.append(time.perf_counter() - start)
+                    found = {
+                        (r["metadata"].get("customer_name"), str(r["metadata"].get("feature_id")))
+                        for r in results
+                    }
+                    recalls.append(1.0 if key in found else 0.0)
+                print(
+                    f"{mode:<8} {kind:<5} {np.mean(recalls):7.2%} "
+                    f"{np.percentile(latencies, 50) * 1000:8.1f} {np.percentile(latencies, 95) * 1000:8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
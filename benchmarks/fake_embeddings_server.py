@@ -0,0 +1,105 @@
+# benchmarks/fake_embeddings_server.py
+# Minimal local stand-in for the OpenAI embeddings endpoint, with configurable
+# latency and injected 429/500 errors. Point OpenAI clients at
+# base_url="http://127.0.0.1:<port>/v1".
+
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DIMENSIONS = 64
+
+
+def fake_vector(text: str) -> list:
+    """Deterministic pseudo-embedding so repeated texts get identical vectors"""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    rng = random.Random(digest)
+    return [rng.uniform(-1, 1) for _ in range(DIMENSIONS)]
+
+
+class FakeEmbeddingsServer:
+    def __init__(self, latency: float = 0.05, per_item_latency: float = 0.0005,
+                 rate_limit_ratio: float = 0.0, server_error_ratio: float = 0.0,
+                 max_concurrent: int = None, port: int = 0):
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.server_error_ratio = server_error_ratio
+        self.max_concurrent = max_concurrent
+        self.requests = 0
+        self.errors_sent = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+
+                with server._lock:
+                    server.requests += 1
+                    server._in_flight += 1
+                    overloaded = server.max_concurrent and server._in_flight > server.max_concurrent
+                try:
+                    roll = random.random()
+                    if overloaded or roll < server.rate_limit_ratio:
+                        with server._lock:
+                            server.errors_sent += 1
+                        self._reply(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                    {"retry-after": "0.05"})
+                        return
+                    if roll < server.rate_limit_ratio + server.server_error_ratio:
+                        with server._lock:
+                            server.errors_sent += 1
+                        self._reply(500, {"error": {"message": "Internal error", "type": "server_error"}})
+                        return
+
+                    time.sleep(server.latency + server.per_item_latency * len(texts))
+                    tokens = sum(len(t) // 4 + 1 for t in texts)
+                    self._reply(200, {
+                        "object": "list",
+                        "model": body.get("model"),
+                        "data": [
+                            {"object": "embedding", "index": i, "embedding": fake_vector(t)}
+                            for i, t in enumerate(texts)
+                        ],
+                        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+                    })
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
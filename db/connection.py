@@ -0,0 +1,55 @@
+# db/connection.py
+# Shared SQLite connection manager: one connection per (thread, database file),
+# WAL journal mode, tuned pragmas and a busy timeout.
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))          # negative = KiB
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(128 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+_local = threading.local()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    # WAL lets dashboard readers proceed while an upload is writing
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    return conn
+
+
+def get_connection(path: str) -> sqlite3.Connection:
+    """
+    Return this thread's connection to path, opening it on first use.
+    Connections are reopened if the file was deleted.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(path)
+    if conn is not None:
+        if os.path.exists(path):
+            return conn
+        conn.close()
+
+    conn = connections[path] = _connect(path)
+    return conn
+
+
+@contextmanager
+def transaction(path: str):
+    """Yield this thread's connection inside a transaction (commit on success, rollback on error)"""
+    conn = get_connection(path)
+    with conn:
+        yield conn
+
@@ -1,10 +1,16 @@
 # db/db_utils.py
 # Fully corrected – includes import pandas as pd
 
-import sqlite3
 import os
+import json
+import time
+import hashlib
+import numpy as np
 import pandas as pd  # ← THIS WAS MISSING – NOW FIXED
 
+from db.connection import get_connection, transaction
+from utils.utils import STATUS_LABELS, release_status_rank
+
 
 
 
@@ -12,7 +18,7 @@ DB_PATH = "data/sales.db"
 
 def init_db():
     os.makedirs("data", exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     c = conn.cursor()
 
     # Dedicated customers table
@@ -46,11 +52,248 @@ def init_db():
     )
     """)
 
+    # Last seen (customer_name, feature_id, status) fingerprint per release feature
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS release_fingerprints (
+        customer_name TEXT,
+        feature_id TEXT,
+        fingerprint TEXT,
+        PRIMARY KEY (customer_name, feature_id)
+    )
+    """)
+    _backfill_release_fingerprints(c)
+
+    # Background ingestion jobs (see logic/ingestion_jobs.py)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS ingestion_jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT,
+        file_name TEXT,
+        file_hash TEXT,
+        path TEXT,
+        state TEXT,
+        rows_done INTEGER DEFAULT 0,
+        progress REAL DEFAULT 0,
+        result TEXT,
+        error TEXT,
+        created_at REAL,
+        updated_at REAL
+    )
+    """)
+
+    _run_migrations(c)
+
     conn.commit()
-    conn.close()
+
+# ==================== Schema migrations ====================
+# Applied in order by init_db; PRAGMA user_version records how many have run.
+
+def _migrate_natural_keys(c):
+    """
+    Dedup contracts on (customer_name, feature_id) and releases on
+    (customer_name, feature_id, status), keeping the newest row, then enforce
+    those natural keys so INSERT OR REPLACE really replaces. The unique indexes
+    also serve lookups by customer_name and (customer_name, feature_id).
+    """
+    c.execute("""
+    DELETE FROM contracts WHERE id NOT IN (
+        SELECT MAX(id) FROM contracts GROUP BY customer_name, feature_id
+    )
+    """)
+    c.execute("""
+    DELETE FROM releases WHERE id NOT IN (
+        SELECT MAX(id) FROM releases GROUP BY customer_name, feature_id, status
+    )
+    """)
+    c.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_contracts_customer_feature
+    ON contracts (customer_name, feature_id)
+    """)
+    c.execute("""
+    CREATE UNIQUE INDEX IF NOT EXISTS ux_releases_customer_feature_status
+    ON releases (customer_name, feature_id, status)
+    """)
+
+def _migrate_release_history(c):
+    """
+    Stamp release rows with their source file and ingest time, index the history,
+    and materialize feature_latest_status from the existing rows (in id order).
+    status_rank keeps the comparator's precedence: Released > Planned > Missing.
+    """
+    c.execute("ALTER TABLE releases ADD COLUMN source_file TEXT")
+    c.execute("ALTER TABLE releases ADD COLUMN ingested_at REAL")
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS ix_releases_history
+    ON releases (customer_name, feature_id, ingested_at)
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS feature_latest_status (
+        customer_name TEXT,
+        feature_id TEXT,
+        feature_name TEXT,
+        latest_status TEXT,
+        status_rank INTEGER,
+        updated_at REAL,
+        PRIMARY KEY (customer_name, feature_id)
+    )
+    """)
+
+    c.execute("SELECT customer_name, feature_id, feature_name, status FROM releases ORDER BY id")
+    latest = {}
+    for customer, feature_id, feature_name, status in c.fetchall():
+        key = (customer, feature_id)
+        rank = release_status_rank(status)
+        if key in latest:
+            rank = max(rank, latest[key][3])
+        latest[key] = (feature_name, status, None, rank)
+    c.executemany("""
+    INSERT OR REPLACE INTO feature_latest_status
+    (customer_name, feature_id, feature_name, latest_status, updated_at, status_rank)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, [(*key, *values) for key, values in latest.items()])
+
+def _migrate_risk_snapshots(c):
+    """Per-customer comparison + risk snapshot, refreshed at ingest time"""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS risk_snapshot_rows (
+        customer_name TEXT,
+        position INTEGER,
+        feature_id TEXT,
+        feature_name TEXT,
+        description TEXT,
+        priority TEXT,
+        status TEXT,
+        risk_level TEXT,
+        risk_reason TEXT,
+        PRIMARY KEY (customer_name, feature_id)
+    )
+    """)
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS ix_risk_snapshot_rows_position
+    ON risk_snapshot_rows (customer_name, position)
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS risk_snapshots (
+        customer_name TEXT PRIMARY KEY,
+        high INTEGER,
+        medium INTEGER,
+        low INTEGER,
+        none INTEGER,
+        computed_at REAL
+    )
+    """)
+
+def _migrate_data_versions(c):
+    """Per-customer data version, bumped by every write that changes a customer's results"""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS customer_data_versions (
+        customer_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at REAL
+    )
+    """)
+
+def _migrate_risk_history(c):
+    """
+    Append-only risk history: per-customer counts plus one small-int risk code per
+    feature, packed into a blob indexed through risk_history_features.
+    Seeded with one point per existing snapshot.
+    """
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS risk_history_features (
+        customer_name TEXT,
+        feature_id TEXT,
+        feature_index INTEGER,
+        PRIMARY KEY (customer_name, feature_id)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS risk_history (
+        customer_name TEXT,
+        recorded_at REAL,
+        high INTEGER,
+        medium INTEGER,
+        low INTEGER,
+        none INTEGER,
+        codes BLOB,
+        PRIMARY KEY (customer_name, recorded_at)
+    )
+    """)
+    c.execute("SELECT customer_name, computed_at FROM risk_snapshots")
+    for customer_name, computed_at in c.fetchall():
+        _append_risk_history(c, [customer_name], computed_at or time.time())
+
+def _migrate_snapshot_rules(c):
+    """Name of the risk rule that decided each snapshot row (NULL for older snapshots)"""
+    c.execute("ALTER TABLE risk_snapshot_rows ADD COLUMN risk_rule TEXT")
+
+def _migrate_release_status_history(c):
+    """
+    Append-only release status history, one row per status change of a feature.
+    releases keeps one row per (customer_name, feature_id, status) for de-duplication,
+    so it cannot say when a status came back. Seeded from the existing release rows.
+    """
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS release_status_history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_name TEXT,
+        feature_id TEXT,
+        feature_name TEXT,
+        status TEXT,
+        source_file TEXT,
+        ingested_at REAL
+    )
+    """)
+    c.execute("""
+    CREATE INDEX IF NOT EXISTS ix_release_status_history
+    ON release_status_history (customer_name, feature_id, ingested_at)
+    """)
+    c.execute("DROP INDEX IF EXISTS ix_releases_history")
+    c.execute("""
+    INSERT INTO release_status_history
+    (customer_name, feature_id, feature_name, status, source_file, ingested_at)
+    SELECT customer_name, feature_id, feature_name, status, source_file, ingested_at
+    FROM releases
+    ORDER BY ingested_at, id
+    """)
+
+MIGRATIONS = [
+    _migrate_natural_keys,
+    _migrate_release_history,
+    _migrate_risk_snapshots,
+    _migrate_data_versions,
+    _migrate_risk_history,
+    _migrate_snapshot_rules,
+    _migrate_release_status_history,
+]
+
+def _run_migrations(c):
+    c.execute("PRAGMA user_version")
+    version = c.fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(c)
+        c.execute(f"PRAGMA user_version = {target}")
+
+def _bump_data_versions(c, customers):
+    """Increment the data version of each customer on an open cursor"""
+    now = time.time()
+    c.executemany("""
+    INSERT INTO customer_data_versions (customer_name, version, updated_at)
+    VALUES (?, 1, ?)
+    ON CONFLICT (customer_name) DO UPDATE SET
+        version = customer_data_versions.version + 1,
+        updated_at = excluded.updated_at
+    """, [(name, now) for name in set(customers)])
+
+def get_data_version(customer_name: str) -> int:
+    """Current data version of a customer (0 if nothing was ever written)"""
+    row = get_connection(DB_PATH).execute(
+        "SELECT version FROM customer_data_versions WHERE customer_name = ?", (customer_name,)
+    ).fetchone()
+    return row[0] if row else 0
 
 def store_contract_to_db(row: dict):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     c = conn.cursor()
     
     # Insert customer if not exists
@@ -68,46 +311,624 @@ def store_contract_to_db(row: dict):
         row.get("description", ""),
         row.get("priority", "")
     ))
+    _bump_data_versions(c, [row["customer_name"]])
     
     conn.commit()
-    conn.close()
 
-def store_release_to_db(row: dict):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    
-    c.execute("""
-    INSERT OR REPLACE INTO releases 
-    (customer_name, feature_id, feature_name, status)
-    VALUES (?, ?, ?, ?)
-    """, (
+def store_release_to_db(row: dict, source_file: str = None):
+    # Goes through the bulk path so release history and latest status stay in sync
+    store_releases_to_db([row], source_file=source_file)
+
+def _iter_rows(rows):
+    """Accept a DataFrame or any iterable of row dicts and yield plain dicts"""
+    if isinstance(rows, pd.DataFrame):
+        # to_dict("records") yields native Python scalars that sqlite3 can bind
+        yield from rows.to_dict("records")
+    else:
+        for row in rows:
+            yield dict(row)
+
+def _table_count(c, table: str) -> int:
+    c.execute(f"SELECT COUNT(*) FROM {table}")
+    return c.fetchone()[0]
+
+def store_contracts_to_db(rows) -> dict:
+    """
+    Bulk counterpart of store_contract_to_db.
+    Writes every row with executemany inside a single transaction.
+    Returns {"rows": written, "inserted": new rows, "replaced": overwritten rows}.
+    """
+    records = [
+        (
+            row["customer_name"],
+            row.get("feature_id"),
+            row.get("feature_name"),
+            row.get("description", ""),
+            row.get("priority", "")
+        )
+        for row in _iter_rows(rows)
+    ]
+    if not records:
+        return {"rows": 0, "inserted": 0, "replaced": 0}
+
+    with transaction(DB_PATH) as conn:
+        c = conn.cursor()
+        before = _table_count(c, "contracts")
+
+        c.executemany(
+            "INSERT OR IGNORE INTO customers (customer_name) VALUES (?)",
+            [(name,) for name in {r[0] for r in records}]
+        )
+        c.executemany("""
+        INSERT OR REPLACE INTO contracts 
+        (customer_name, feature_id, feature_name, description, priority)
+        VALUES (?, ?, ?, ?, ?)
+        """, records)
+        _bump_data_versions(c, (r[0] for r in records))
+
+        inserted = _table_count(c, "contracts") - before
+
+    return {"rows": len(records), "inserted": inserted, "replaced": len(records) - inserted}
+
+def _release_record(row: dict, source_file: str, ingested_at: float) -> tuple:
+    return (
         row["customer_name"],
         row.get("feature_id"),
         row.get("feature_name"),
-        row.get("status", "")
-    ))
-    
-    conn.commit()
-    conn.close()
+        row.get("status", ""),
+        source_file,
+        ingested_at
+    )
+
+def _write_release_records(c, records: list) -> int:
+    """
+    Write release records on an open cursor, append status changes to
+    release_status_history and fold them into feature_latest_status.
+    Returns how many were new (customer, feature, status) rows.
+    """
+    before = _table_count(c, "releases")
+    # releases de-duplicates on its natural key and keeps the first file and time seen
+    c.executemany("""
+    INSERT INTO releases 
+    (customer_name, feature_id, feature_name, status, source_file, ingested_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (customer_name, feature_id, status) DO UPDATE SET
+        feature_name = excluded.feature_name
+    """, records)
+    inserted = _table_count(c, "releases") - before
+
+    # History rows are never updated; a row is appended whenever a feature's status
+    # differs from its most recent one (so a retried or re-uploaded file adds nothing)
+    c.executemany("""
+    INSERT INTO release_status_history
+    (customer_name, feature_id, feature_name, status, source_file, ingested_at)
+    SELECT ?, ?, ?, ?, ?, ?
+    WHERE (
+        SELECT status FROM release_status_history
+        WHERE customer_name = ? AND feature_id = ?
+        ORDER BY ingested_at DESC, id DESC LIMIT 1
+    ) IS NOT ?
+    """, [(*record, record[0], record[1], record[3]) for record in records])
+
+    c.executemany("""
+    INSERT INTO feature_latest_status
+    (customer_name, feature_id, feature_name, latest_status, status_rank, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (customer_name, feature_id) DO UPDATE SET
+        feature_name = excluded.feature_name,
+        latest_status = excluded.latest_status,
+        status_rank = MAX(feature_latest_status.status_rank, excluded.status_rank),
+        updated_at = excluded.updated_at
+    """, [
+        (customer, feature_id, feature_name, status, release_status_rank(status), ingested_at)
+        for customer, feature_id, feature_name, status, _, ingested_at in records
+    ])
+    _bump_data_versions(c, (r[0] for r in records))
+    return inserted
+
+def store_releases_to_db(rows, source_file: str = None, ingested_at: float = None) -> dict:
+    """
+    Bulk counterpart of store_release_to_db.
+    Writes every row with executemany inside a single transaction.
+    Returns {"rows": written, "inserted": new rows, "replaced": overwritten rows}.
+    """
+    ingested_at = ingested_at or time.time()
+    records = [_release_record(row, source_file, ingested_at) for row in _iter_rows(rows)]
+    if not records:
+        return {"rows": 0, "inserted": 0, "replaced": 0}
+
+    with transaction(DB_PATH) as conn:
+        inserted = _write_release_records(conn.cursor(), records)
+
+    return {"rows": len(records), "inserted": inserted, "replaced": len(records) - inserted}
+
+def release_fingerprint(customer_name, feature_id, status) -> str:
+    """Fingerprint of the (customer_name, feature_id, status) triple of a release row"""
+    raw = "\x1f".join(str(v).strip() for v in (customer_name, feature_id, status))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _release_key(customer_name, feature_id) -> tuple:
+    return (str(customer_name), str(feature_id))
+
+def store_release_changes_to_db(rows, source_file: str = None, ingested_at: float = None,
+                                pending_fingerprints: dict = None) -> tuple:
+    """
+    Incremental release ingestion.
+    Each row is fingerprinted and compared with the last fingerprint stored for its
+    (customer_name, feature_id); only new or changed rows are written.
+    With pending_fingerprints, new fingerprints are collected there (and take
+    precedence over stored ones) instead of being stored; the caller records them
+    with record_release_fingerprints once the rows are embedded and scored, so a
+    failed ingest is retried in full rather than seen as unchanged.
+    Returns (stats, written_rows) where stats has rows, added, changed, unchanged,
+    inserted and replaced, and written_rows are the row dicts that were stored.
+    """
+    rows = list(_iter_rows(rows))
+    ingested_at = ingested_at or time.time()
+    stats = {"rows": len(rows), "added": 0, "changed": 0, "unchanged": 0, "inserted": 0, "replaced": 0}
+    if not rows:
+        return stats, []
+
+    with transaction(DB_PATH) as conn:
+        c = conn.cursor()
+
+        known = {}
+        customers = list({str(row["customer_name"]) for row in rows})
+        for start in range(0, len(customers), 500):
+            part = customers[start:start + 500]
+            c.execute(
+                f"SELECT customer_name, feature_id, fingerprint FROM release_fingerprints "
+                f"WHERE customer_name IN ({','.join('?' * len(part))})",
+                part
+            )
+            for customer_name, feature_id, fingerprint in c.fetchall():
+                known[(customer_name, feature_id)] = fingerprint
+        if pending_fingerprints:
+            known.update(pending_fingerprints)
+
+        written_rows, updates = [], {}
+        for row in rows:
+            key = _release_key(row["customer_name"], row.get("feature_id"))
+            fingerprint = release_fingerprint(row["customer_name"], row.get("feature_id"), row.get("status", ""))
+            previous = known.get(key)
+            if previous == fingerprint:
+                stats["unchanged"] += 1
+                continue
+            stats["added" if previous is None else "changed"] += 1
+            known[key] = updates[key] = fingerprint
+            written_rows.append(row)
+
+        if written_rows:
+            stats["inserted"] = _write_release_records(
+                c, [_release_record(r, source_file, ingested_at) for r in written_rows]
+            )
+            stats["replaced"] = len(written_rows) - stats["inserted"]
+            if pending_fingerprints is None:
+                _write_release_fingerprints(c, updates)
+            else:
+                pending_fingerprints.update(updates)
+
+    return stats, written_rows
+
+def _write_release_fingerprints(c, fingerprints: dict):
+    c.executemany(
+        "INSERT OR REPLACE INTO release_fingerprints (customer_name, feature_id, fingerprint) VALUES (?, ?, ?)",
+        [(*key, fp) for key, fp in fingerprints.items()]
+    )
+
+def record_release_fingerprints(fingerprints: dict):
+    """Store fingerprints collected by store_release_changes_to_db(pending_fingerprints=...)"""
+    if not fingerprints:
+        return
+    with transaction(DB_PATH) as conn:
+        _write_release_fingerprints(conn.cursor(), fingerprints)
+
+def _backfill_release_fingerprints(c):
+    """Seed fingerprints from releases loaded before row-level diffing existed (latest row wins)"""
+    c.execute("SELECT COUNT(*) FROM release_fingerprints")
+    if c.fetchone()[0]:
+        return
+    c.execute("SELECT customer_name, feature_id, status FROM releases ORDER BY id")
+    latest = {}
+    for customer_name, feature_id, status in c.fetchall():
+        latest[_release_key(customer_name, feature_id)] = release_fingerprint(customer_name, feature_id, status)
+    _write_release_fingerprints(c, latest)
 
 def load_contracts_for_customer(customer_name: str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     query = """
     SELECT feature_id, feature_name, description, priority 
     FROM contracts 
     WHERE customer_name = ?
     """
     df = pd.read_sql_query(query, conn, params=(customer_name,))
-    conn.close()
     return df if not df.empty else pd.DataFrame(columns=["feature_id", "feature_name", "description", "priority"])
 
 def load_all_releases_for_customer(customer_name: str) -> pd.DataFrame:
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     query = """
     SELECT feature_id, feature_name, status 
     FROM releases 
     WHERE customer_name = ?
     """
     df = pd.read_sql_query(query, conn, params=(customer_name,))
-    conn.close()
-    return df if not df.empty else pd.DataFrame(columns=["feature_id", "feature_name", "status"])
\ No newline at end of file
+    return df if not df.empty else pd.DataFrame(columns=["feature_id", "feature_name", "status"])
+
+def load_latest_status_for_customer(customer_name: str) -> pd.DataFrame:
+    """
+    One row per released/planned feature from feature_latest_status.
+    status is the resolved comparator status (Released > Planned > Missing across all
+    history); latest_status is the raw status of the most recent release row.
+    """
+    conn = get_connection(DB_PATH)
+    query = """
+    SELECT feature_id, feature_name, status_rank, latest_status
+    FROM feature_latest_status
+    WHERE customer_name = ?
+    """
+    df = pd.read_sql_query(query, conn, params=(customer_name,))
+    if df.empty:
+        return pd.DataFrame(columns=["feature_id", "feature_name", "status", "latest_status"])
+    df.insert(2, "status", [STATUS_LABELS[r] for r in df.pop("status_rank")])
+    return df
+
+def load_release_history(customer_name: str, feature_id: str = None) -> pd.DataFrame:
+    """Status changes for a customer (optionally one feature), oldest first"""
+    conn = get_connection(DB_PATH)
+    query = """
+    SELECT feature_id, feature_name, status, source_file, ingested_at
+    FROM release_status_history
+    WHERE customer_name = ?
+    """
+    params = [customer_name]
+    if feature_id is not None:
+        query += " AND feature_id = ?"
+        params.append(feature_id)
+    query += " ORDER BY feature_id, ingested_at, id"
+    return pd.read_sql_query(query, conn, params=params)
+
+def _read_for_customers(select: str, order_by: str, customers=None, where: str = None, params=()) -> pd.DataFrame:
+    """
+    Run a multi-customer SELECT in one query, or with a customer_name IN (...) filter.
+    where/params add further conditions. Large filters are split into chunks to stay
+    below SQLite's bound-parameter limit.
+    """
+    conn = get_connection(DB_PATH)
+    conditions = [where] if where else []
+    if customers is None:
+        clause = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return pd.read_sql_query(f"{select}{clause} ORDER BY {order_by}", conn, params=list(params))
+
+    customers = list(dict.fromkeys(customers))
+    parts = []
+    for start in range(0, max(len(customers), 1), 500):
+        part = customers[start:start + 500]
+        clause = " AND ".join([f"customer_name IN ({','.join('?' * len(part))})", *conditions])
+        parts.append(pd.read_sql_query(
+            f"{select} WHERE {clause} ORDER BY {order_by}",
+            conn, params=[*part, *params]
+        ))
+    return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+
+def load_contracts_for_customers(customers=None) -> pd.DataFrame:
+    """Contracts for every customer (or the given ones), ordered by customer_name, feature_id"""
+    return _read_for_customers(
+        "SELECT customer_name, feature_id, feature_name, description, priority FROM contracts",
+        "customer_name, feature_id",
+        customers
+    )
+
+def load_latest_status_for_customers(customers=None) -> pd.DataFrame:
+    """feature_latest_status rows for every customer (or the given ones), with the raw status_rank"""
+    return _read_for_customers(
+        "SELECT customer_name, feature_id, status_rank FROM feature_latest_status",
+        "customer_name, feature_id",
+        customers
+    )
+
+SNAPSHOT_COLUMNS = [
+    "feature_id", "feature_name", "description", "priority", "status", "risk_level", "risk_reason"
+]
+RISK_LEVELS = ["HIGH", "MEDIUM", "LOW", "NONE"]
+
+def _write_risk_snapshot(c, customer_name: str, summary_table: pd.DataFrame, counts: dict):
+    """Replace a customer's snapshot rows and risk counts on an open cursor"""
+    table = summary_table.reindex(columns=SNAPSHOT_COLUMNS)
+    matched_rules = counts.get("matched_rules") or [None] * len(table)
+    records = [
+        (customer_name, position, *values, rule)
+        for position, (values, rule) in enumerate(zip(table.itertuples(index=False, name=None), matched_rules))
+    ]
+    c.execute("DELETE FROM risk_snapshot_rows WHERE customer_name = ?", (customer_name,))
+    c.executemany(f"""
+    INSERT OR REPLACE INTO risk_snapshot_rows
+    (customer_name, position, {', '.join(SNAPSHOT_COLUMNS)}, risk_rule)
+    VALUES ({', '.join('?' * (len(SNAPSHOT_COLUMNS) + 3))})
+    """, records)
+    c.execute("""
+    INSERT OR REPLACE INTO risk_snapshots (customer_name, high, medium, low, none, computed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """, (customer_name, *(int(counts.get(level, 0)) for level in RISK_LEVELS), time.time()))
+    # Snapshots land after the data write; bump again so nothing caches the stale one
+    _bump_data_versions(c, [customer_name])
+
+def refresh_risk_snapshot(customer_name: str, compute):
+    """
+    Recompute and store a customer's snapshot in one write transaction.
+    compute() reads the customer's data through this thread's connection and returns
+    (summary_table, counts); counts["matched_rules"], if present, is the deciding rule
+    name per summary_table row. The write lock is taken before those reads, so a
+    concurrent ingest commits either before the recompute or after the save, never
+    in between.
+    """
+    conn = get_connection(DB_PATH)
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        summary_table, counts = compute()
+        _write_risk_snapshot(conn.cursor(), customer_name, summary_table, counts)
+
+def load_risk_snapshot(customer_name: str):
+    """
+    Return (summary_table, counts) for a customer's stored snapshot, or None if there is none.
+    Rows come back in their original order through the (customer_name, position) index;
+    counts["matched_rules"] lists each row's deciding rule (None for older snapshots).
+    """
+    conn = get_connection(DB_PATH)
+    counts_row = conn.execute(
+        "SELECT high, medium, low, none FROM risk_snapshots WHERE customer_name = ?", (customer_name,)
+    ).fetchone()
+    if counts_row is None:
+        return None
+    summary_table = pd.read_sql_query(f"""
+    SELECT {', '.join(SNAPSHOT_COLUMNS)}, risk_rule
+    FROM risk_snapshot_rows
+    WHERE customer_name = ?
+    ORDER BY position
+    """, conn, params=(customer_name,))
+    counts = dict(zip(RISK_LEVELS, counts_row))
+    counts["matched_rules"] = [None if pd.isna(r) else r for r in summary_table.pop("risk_rule")]
+    return summary_table, counts
+
+def update_risk_snapshot_features(customer_name: str, feature_ids, assess):
+    """
+    Re-score only the given features of a customer's stored snapshot.
+    Their current status_rank is read from feature_latest_status and passed to
+    assess(rows) (the SNAPSHOT_COLUMNS plus status_rank), which returns the new
+    status, risk_level, risk_reason and risk_rule columns. Changed rows are rewritten and
+    the stored counts shifted by the delta, all in one write transaction.
+    Returns the per-level count deltas, or None if the customer has no snapshot yet.
+    """
+    feature_ids = list(dict.fromkeys(feature_ids))
+    conn = get_connection(DB_PATH)
+    with conn:
+        # Take the write lock before reading so concurrent ingests can't apply stale deltas
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute(
+            "SELECT 1 FROM risk_snapshots WHERE customer_name = ?", (customer_name,)
+        ).fetchone() is None:
+            return None
+
+        parts = []
+        for start in range(0, len(feature_ids), 500):
+            part = feature_ids[start:start + 500]
+            parts.append(pd.read_sql_query(f"""
+            SELECT {', '.join('r.' + column for column in SNAPSHOT_COLUMNS)},
+                COALESCE(f.status_rank, 0) AS status_rank
+            FROM risk_snapshot_rows r
+            LEFT JOIN feature_latest_status f
+                ON f.customer_name = r.customer_name AND f.feature_id = r.feature_id
+            WHERE r.customer_name = ? AND r.feature_id IN ({','.join('?' * len(part))})
+            """, conn, params=[customer_name, *part]))
+        deltas = dict.fromkeys(RISK_LEVELS, 0)
+        rows = pd.concat(parts, ignore_index=True) if parts else None
+        if rows is None or rows.empty:
+            return deltas
+
+        scored = assess(rows)
+        conn.executemany("""
+        UPDATE risk_snapshot_rows SET status = ?, risk_level = ?, risk_reason = ?, risk_rule = ?
+        WHERE customer_name = ? AND feature_id = ?
+        """, [
+            (status, level, reason, rule, customer_name, feature_id)
+            for status, level, reason, rule, feature_id in zip(
+                scored["status"], scored["risk_level"], scored["risk_reason"], scored["risk_rule"],
+                rows["feature_id"]
+            )
+        ])
+
+        for old, new in zip(rows["risk_level"], scored["risk_level"]):
+            if old != new:
+                deltas[old] = deltas.get(old, 0) - 1
+                deltas[new] = deltas.get(new, 0) + 1
+        conn.execute("""
+        UPDATE risk_snapshots
+        SET high = high + ?, medium = medium + ?, low = low + ?, none = none + ?, computed_at = ?
+        WHERE customer_name = ?
+        """, (*(deltas[level] for level in RISK_LEVELS), time.time(), customer_name))
+        _bump_data_versions(conn.cursor(), [customer_name])
+    return deltas
+
+# ==================== Risk history ====================
+# risk_history.codes holds one uint8 per feature_index: RISK_LEVELS position,
+# or RISK_CODE_ABSENT for features not in the customer's snapshot at that time.
+
+RISK_CODE_ABSENT = 255
+RISK_LEVEL_CODES = {level: code for code, level in enumerate(RISK_LEVELS)}
+
+def _append_risk_history(c, customers, recorded_at: float):
+    """Append one history point per customer from its current risk snapshot"""
+    for customer_name in customers:
+        c.execute(
+            "SELECT high, medium, low, none FROM risk_snapshots WHERE customer_name = ?", (customer_name,)
+        )
+        counts = c.fetchone()
+        if counts is None:
+            continue
+        c.execute(
+            "SELECT feature_id, risk_level FROM risk_snapshot_rows WHERE customer_name = ?", (customer_name,)
+        )
+        rows = c.fetchall()
+        c.execute(
+            "SELECT feature_id, feature_index FROM risk_history_features WHERE customer_name = ?",
+            (customer_name,)
+        )
+        index = dict(c.fetchall())
+
+        new_features = [feature_id for feature_id, _ in rows if feature_id not in index]
+        for feature_id in new_features:
+            index[feature_id] = len(index)
+        c.executemany(
+            "INSERT INTO risk_history_features (customer_name, feature_id, feature_index) VALUES (?, ?, ?)",
+            [(customer_name, feature_id, index[feature_id]) for feature_id in new_features]
+        )
+
+        codes = bytearray([RISK_CODE_ABSENT]) * len(index)
+        for feature_id, risk_level in rows:
+            codes[index[feature_id]] = RISK_LEVEL_CODES.get(risk_level, RISK_CODE_ABSENT)
+        c.execute("""
+        INSERT OR REPLACE INTO risk_history (customer_name, recorded_at, high, medium, low, none, codes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (customer_name, recorded_at, *counts, bytes(codes)))
+
+def record_risk_history(customers, recorded_at: float = None):
+    """Append the current snapshot of each customer to risk_history"""
+    with transaction(DB_PATH) as conn:
+        _append_risk_history(conn.cursor(), list(customers), recorded_at or time.time())
+
+def _epoch(value):
+    """Unix seconds from None, a number, or anything pd.Timestamp accepts"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return pd.Timestamp(value).timestamp()
+
+def _history_range(start, end):
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("recorded_at >= ?")
+        params.append(_epoch(start))
+    if end is not None:
+        conditions.append("recorded_at <= ?")
+        params.append(_epoch(end))
+    return " AND ".join(conditions) or None, params
+
+def load_risk_trend(customers=None, start=None, end=None) -> pd.DataFrame:
+    """
+    Risk counts over time for one customer (str), several, or all (None),
+    optionally limited to [start, end]. Reads risk_history only.
+    Columns: customer_name, recorded_at (datetime), HIGH, MEDIUM, LOW, NONE.
+    """
+    if isinstance(customers, str):
+        customers = [customers]
+    where, params = _history_range(start, end)
+    df = _read_for_customers(
+        "SELECT customer_name, recorded_at, high AS HIGH, medium AS MEDIUM, low AS LOW, none AS NONE "
+        "FROM risk_history",
+        "customer_name, recorded_at",
+        customers, where, params
+    )
+    df["recorded_at"] = pd.to_datetime(df["recorded_at"], unit="s")
+    return df
+
+def load_feature_risk_history(customer_name: str, start=None, end=None) -> pd.DataFrame:
+    """Per-feature risk levels over time, decoded from risk_history codes: recorded_at, feature_id, risk_level"""
+    where, params = _history_range(start, end)
+    history = _read_for_customers(
+        "SELECT recorded_at, codes FROM risk_history", "recorded_at", [customer_name], where, params
+    )
+    features = get_connection(DB_PATH).execute(
+        "SELECT feature_index, feature_id FROM risk_history_features WHERE customer_name = ?", (customer_name,)
+    ).fetchall()
+    feature_ids = np.empty(len(features), dtype=object)
+    for feature_index, feature_id in features:
+        feature_ids[feature_index] = feature_id
+
+    levels = np.array(RISK_LEVELS, dtype=object)
+    parts = []
+    for recorded_at, blob in zip(history["recorded_at"], history["codes"]):
+        codes = np.frombuffer(blob, dtype=np.uint8)
+        present = np.flatnonzero(codes != RISK_CODE_ABSENT)
+        parts.append(pd.DataFrame({
+            "recorded_at": recorded_at,
+            "feature_id": feature_ids[present],
+            "risk_level": levels[codes[present]],
+        }))
+    if not parts:
+        return pd.DataFrame(columns=["recorded_at", "feature_id", "risk_level"])
+    df = pd.concat(parts, ignore_index=True)
+    df["recorded_at"] = pd.to_datetime(df["recorded_at"], unit="s")
+    return df
+
+def load_customer_names() -> list:
+    conn = get_connection(DB_PATH)
+    rows = conn.execute("SELECT DISTINCT customer_name FROM customers").fetchall()
+    return [r[0] for r in rows]
+
+def clear_sales_db():
+    """
+    Drop every table in the sales database; init_db() recreates the schema.
+    Used by "Clear All Data" instead of deleting the file, which is unsafe while
+    other threads still hold WAL-mode connections to it.
+    """
+    with transaction(DB_PATH) as conn:
+        tables = [
+            r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+        ]
+        for table in tables:
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        # Let init_db() re-apply every migration to the fresh schema
+        conn.execute("PRAGMA user_version = 0")
+    conn.execute("VACUUM")
+
+# ==================== Ingestion job records ====================
+
+JOB_COLUMNS = [
+    "job_id", "kind", "file_name", "file_hash", "path", "state",
+    "rows_done", "progress", "result", "error", "created_at", "updated_at"
+]
+
+def create_ingestion_job(job_id: str, kind: str, file_name: str, file_hash: str, path: str, state: str):
+    now = time.time()
+    conn = get_connection(DB_PATH)
+    with conn:
+        conn.execute("""
+        INSERT INTO ingestion_jobs (job_id, kind, file_name, file_hash, path, state, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (job_id, kind, file_name, file_hash, path, state, now, now))
+
+def update_ingestion_job(job_id: str, **fields):
+    """Update any of state, rows_done, progress, result (dict) or error for a job"""
+    if "result" in fields and fields["result"] is not None:
+        fields["result"] = json.dumps(fields["result"])
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    conn = get_connection(DB_PATH)
+    with conn:
+        conn.execute(
+            f"UPDATE ingestion_jobs SET {assignments} WHERE job_id = ?",
+            (*fields.values(), job_id)
+        )
+
+def _job_from_row(row) -> dict:
+    job = dict(zip(JOB_COLUMNS, row))
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+def get_ingestion_job(job_id: str):
+    conn = get_connection(DB_PATH)
+    row = conn.execute(
+        f"SELECT {', '.join(JOB_COLUMNS)} FROM ingestion_jobs WHERE job_id = ?", (job_id,)
+    ).fetchone()
+    return _job_from_row(row) if row else None
+
+def list_ingestion_jobs(states=None) -> list:
+    query = f"SELECT {', '.join(JOB_COLUMNS)} FROM ingestion_jobs"
+    params = ()
+    if states:
+        query += f" WHERE state IN ({','.join('?' * len(states))})"
+        params = tuple(states)
+    query += " ORDER BY created_at"
+    conn = get_connection(DB_PATH)
+    rows = conn.execute(query, params).fetchall()
+    return [_job_from_row(r) for r in rows]
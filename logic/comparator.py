@@ -1,8 +1,16 @@
 # automated_sales_enablement/logic/comparator.py
 # Survives ANY data state: empty, missing columns, NaN, no releases, etc.
 
+import numpy as np
 import pandas as pd
 
+from utils.utils import RELEASED_STATUSES, STATUS_LABELS
+
+# Normalized status strings that carry a rank; everything else ranks as Missing (0)
+STATUS_CATEGORIES = RELEASED_STATUSES + ['planned']
+CATEGORY_RANKS = np.array([2] * len(RELEASED_STATUSES) + [1], dtype=np.int8)
+RANK_LABELS = np.array(STATUS_LABELS, dtype=object)
+
 def compare_features_agent(agent, contract_df: pd.DataFrame, release_df: pd.DataFrame) -> dict:
     """
     Safely compares contract features against release status.
@@ -62,17 +70,16 @@ def compare_features_agent(agent, contract_df: pd.DataFrame, release_df: pd.Data
         rel = rel[rel['status_clean'] != 'nan']
 
         if not rel.empty:
-            # Determine status for each feature_id
-            def get_feature_status(group_df):
-                statuses = group_df['status_clean'].tolist()
-                if any(s in ['released', 'done', 'completed', 'yes', 'true'] for s in statuses):
-                    return 'Released'
-                if 'planned' in statuses:
-                    return 'Planned'
-                return 'Missing'
-
-            # Group and apply
-            status_map = rel.groupby('feature_id').apply(get_feature_status).reset_index(name='release_status')
+            # Determine status for each feature_id: rank every row through a categorical
+            # lookup (Released=2 > Planned=1 > anything else=0) and keep each feature's max
+            codes = pd.Categorical(rel['status_clean'], categories=STATUS_CATEGORIES).codes
+            rel['rank'] = np.where(codes >= 0, CATEGORY_RANKS[codes], 0)
+
+            best_rank = rel.groupby('feature_id', sort=False)['rank'].max()
+            status_map = pd.DataFrame({
+                'feature_id': best_rank.index,
+                'release_status': RANK_LABELS[best_rank.to_numpy()],
+            })
 
             # Merge into summary
             summary_df = summary_df.merge(status_map, on='feature_id', how='left')
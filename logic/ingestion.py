@@ -0,0 +1,161 @@
+# logic/ingestion.py
+# Streaming CSV ingestion: SQLite + vector DB, one bounded chunk at a time.
+
+import os
+import time
+import pandas as pd
+
+from db.db_utils import (
+    store_contracts_to_db,
+    store_release_changes_to_db,
+    record_release_fingerprints,
+    record_risk_history,
+)
+from rag.rag_engine import ingest_batch_to_vector_db
+from logic.risk_snapshot import refresh_risk_snapshots, update_risk_snapshots
+from utils.utils import normalize_text, chunk_text
+
+CONTRACT_COLUMNS = ["customer_name", "feature_id", "feature_name", "description", "priority"]
+RELEASE_COLUMNS = ["customer_name", "feature_id", "feature_name", "status"]
+
+# Rows read from the CSV per chunk; memory use is bounded by this, not the file size
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "5000"))
+
+# Rows kept in memory for the "Uploaded Files" preview
+PREVIEW_ROWS = 1000
+
+
+def contract_vector_chunks(df: pd.DataFrame):
+    """Build (texts, metadatas) for the contract rows of a DataFrame"""
+    texts, metadatas = [], []
+    for row in df.to_dict("records"):
+        text = normalize_text(
+            f"Contract: {row['feature_name']} — {row['description']} (Priority: {row['priority']})"
+        )
+        for chunk in chunk_text(text):
+            texts.append(chunk)
+            metadatas.append(
+                {"type": "contract", "customer_name": row["customer_name"], "feature_id": row["feature_id"]}
+            )
+    return texts, metadatas
+
+
+def release_vector_chunks(df: pd.DataFrame):
+    """Build (texts, metadatas) for the release rows of a DataFrame"""
+    texts, metadatas = [], []
+    for row in df.to_dict("records"):
+        text = normalize_text(
+            f"Release: {row['feature_name']} — Status: {row['status']}"
+        )
+        for chunk in chunk_text(text):
+            texts.append(chunk)
+            metadatas.append(
+                {"type": "release", "customer_name": row["customer_name"], "feature_id": row["feature_id"]}
+            )
+    return texts, metadatas
+
+
+def _store_contract_chunk(df: pd.DataFrame, source_name: str, ingested_at: float, fingerprints: dict):
+    """Contracts are written in full; every row is (re-)embedded"""
+    return store_contracts_to_db(df), df
+
+
+def _store_release_chunk(df: pd.DataFrame, source_name: str, ingested_at: float, fingerprints: dict):
+    """Releases are diffed row by row; only new or changed rows are embedded"""
+    stats, written_rows = store_release_changes_to_db(
+        df, source_file=source_name, ingested_at=ingested_at, pending_fingerprints=fingerprints
+    )
+    return stats, pd.DataFrame(written_rows, columns=df.columns)
+
+
+INGEST_KINDS = {
+    "contract": (CONTRACT_COLUMNS, _store_contract_chunk, contract_vector_chunks),
+    "release": (RELEASE_COLUMNS, _store_release_chunk, release_vector_chunks),
+}
+
+# Counters summed across chunks (release diff counts only appear for releases)
+SUMMARY_COUNTERS = ["rows", "inserted", "replaced", "added", "changed", "unchanged"]
+
+
+def _file_size(file) -> int:
+    size = getattr(file, "size", None)
+    if size:
+        return size
+    pos = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(pos)
+    return size
+
+
+def ingest_csv_stream(
+    file,
+    kind: str,
+    vector_client=None,
+    embedding_func=None,
+    chunk_rows: int = INGEST_CHUNK_ROWS,
+    progress=None,
+    source_name: str = None
+) -> dict:
+    """
+    Stream a contract or release CSV into SQLite and the vector DB in fixed-size chunks.
+    Required columns are validated on the first chunk (ValueError if missing).
+    progress, if given, is called as progress(rows_done, fraction_of_file_read).
+    Release rows are stamped with source_name and a single ingest timestamp.
+    Returns a summary dict: rows, inserted, replaced, chunks, customers, preview,
+    plus added/changed/unchanged row counts and rescored features for release files.
+    """
+    required, store_rows, vector_chunks = INGEST_KINDS[kind]
+
+    ingested_at = time.time()
+    file.seek(0)
+    total_bytes = _file_size(file) or 1
+
+    summary = {"rows": 0, "inserted": 0, "replaced": 0, "chunks": 0, "customers": set()}
+    preview_parts = []
+    preview_len = 0
+    touched_customers = set()  # contract changes: recompute the customer's whole snapshot
+    changed_features = {}      # release changes: re-score only these (customer_name, feature_id)
+    # Release fingerprints are stored only after embedding and rescoring succeed
+    fingerprints = {}
+
+    for i, df in enumerate(pd.read_csv(file, chunksize=chunk_rows)):
+        if i == 0 and not all(c in df.columns for c in required):
+            raise ValueError(f"Missing columns. Need: {', '.join(required)}")
+
+        write_stats, to_embed = store_rows(df, source_name, ingested_at, fingerprints)
+        texts, metadatas = vector_chunks(to_embed)
+        summary["chunks"] += ingest_batch_to_vector_db(vector_client, embedding_func, texts, metadatas)
+
+        for key in SUMMARY_COUNTERS:
+            if key in write_stats:
+                summary[key] = summary.get(key, 0) + write_stats[key]
+        summary["customers"].update(df["customer_name"].dropna().unique().tolist())
+        if kind == "release":
+            for customer_name, feature_id in zip(to_embed["customer_name"], to_embed["feature_id"]):
+                if pd.notna(customer_name):
+                    changed_features.setdefault(customer_name, set()).add(str(feature_id))
+        else:
+            touched_customers.update(to_embed["customer_name"].dropna().unique().tolist())
+
+        if preview_len < PREVIEW_ROWS:
+            part = df.head(PREVIEW_ROWS - preview_len)
+            preview_parts.append(part)
+            preview_len += len(part)
+
+        if progress is not None:
+            progress(summary["rows"], min(file.tell() / total_bytes, 1.0))
+
+    # Materialize comparison + risk for affected customers now, not on every dashboard rerun
+    refresh_risk_snapshots(sorted(touched_customers))
+    if kind == "release":
+        summary["rescored"] = update_risk_snapshots(changed_features)
+        record_release_fingerprints(fingerprints)
+    # One trend point per affected customer, stamped with this ingest
+    record_risk_history(sorted(touched_customers | set(changed_features)), recorded_at=ingested_at)
+
+    summary["customers"] = sorted(summary["customers"])
+    summary["preview"] = (
+        pd.concat(preview_parts, ignore_index=True) if preview_parts else pd.DataFrame(columns=required)
+    )
+    return summary
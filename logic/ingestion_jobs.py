@@ -0,0 +1,122 @@
+# logic/ingestion_jobs.py
+# Background ingestion: uploads are written to disk, queued as persisted job
+# records and processed by a worker pool outside the Streamlit script run.
+
+import os
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from db.db_utils import (
+    create_ingestion_job,
+    update_ingestion_job,
+    get_ingestion_job,
+    list_ingestion_jobs,
+)
+from logic.ingestion import ingest_csv_stream, PREVIEW_ROWS
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+UPLOAD_DIR = "data/uploads"
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+logger = logging.getLogger(__name__)
+
+# The executor lives in this module so it survives Streamlit reruns and
+# browser refreshes; it only goes away with the server process.
+_executor = None
+_executor_lock = threading.Lock()
+_recovered = False
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+        return _executor
+
+
+def _run_job(job_id: str, path: str, kind: str, file_name: str = None):
+    update_ingestion_job(job_id, state=JOB_RUNNING)
+
+    def report(rows_done, fraction):
+        update_ingestion_job(job_id, rows_done=rows_done, progress=fraction)
+
+    try:
+        with open(path, "rb") as f:
+            summary = ingest_csv_stream(f, kind, progress=report, source_name=file_name)
+    except Exception as e:
+        # ValueError is a schema problem in the uploaded file, reported to the user as-is
+        if not isinstance(e, ValueError):
+            logger.exception("Ingestion job %s failed", job_id)
+        update_ingestion_job(job_id, state=JOB_FAILED, error=str(e))
+        return
+
+    summary.pop("preview", None)  # re-read from the upload file when the job is collected
+    update_ingestion_job(
+        job_id, state=JOB_DONE, rows_done=summary["rows"], progress=1.0, result=summary
+    )
+
+
+def enqueue_ingestion(file_name: str, file_bytes: bytes, file_hash: str, kind: str) -> str:
+    """Persist the upload, record a queued job and hand it to the worker pool. Returns the job id."""
+    recover_interrupted_jobs()
+
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    path = os.path.join(UPLOAD_DIR, f"{job_id}.csv")
+    with open(path, "wb") as f:
+        f.write(file_bytes)
+
+    create_ingestion_job(job_id, kind, file_name, file_hash, path, JOB_QUEUED)
+    _get_executor().submit(_run_job, job_id, path, kind, file_name)
+    return job_id
+
+
+def get_job(job_id: str):
+    return get_ingestion_job(job_id)
+
+
+def has_active_jobs() -> bool:
+    """True while any upload, from any session, is queued or being ingested"""
+    return bool(list_ingestion_jobs(states=[JOB_QUEUED, JOB_RUNNING]))
+
+
+def recover_interrupted_jobs():
+    """
+    Run once per process. Jobs left running by a previous process are marked
+    failed; jobs still queued are resubmitted since their upload is on disk.
+    """
+    global _recovered
+    with _executor_lock:
+        if _recovered:
+            return
+        _recovered = True
+
+    for job in list_ingestion_jobs(states=[JOB_QUEUED, JOB_RUNNING]):
+        if job["state"] == JOB_RUNNING or not os.path.exists(job["path"] or ""):
+            update_ingestion_job(job["job_id"], state=JOB_FAILED, error="Interrupted by a server restart")
+        else:
+            _get_executor().submit(_run_job, job["job_id"], job["path"], job["kind"], job["file_name"])
+
+
+def discard_upload(job: dict):
+    """Remove the on-disk copy of a finished job's upload"""
+    path = job.get("path")
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def load_upload_preview(job: dict):
+    """Read the preview rows for a finished job from its upload file"""
+    path = job.get("path")
+    if path and os.path.exists(path):
+        return pd.read_csv(path, nrows=PREVIEW_ROWS)
+    return pd.DataFrame()
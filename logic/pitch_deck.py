@@ -6,7 +6,7 @@ import re
 from datetime import datetime
 
 from autogen_agentchat.agents import AssistantAgent
-from rag.rag_engine import query_vector_db
+from rag.rag_engine import query_vector_db, select_context
 from db.db_utils import load_contracts_for_customer, load_all_releases_for_customer
 
 
@@ -40,15 +40,18 @@ Delivered: {released}
 Planned / In progress: {planned}
 Not yet addressed: {missing}"""
 
-    # Get relevant context from vector DB
+    # Get relevant context from vector DB; select_context keeps a diverse,
+    # de-duplicated subset of the same top 12 within CONTEXT_TOKEN_BUDGET
+    context_query = "strategic overview contract commitments roadmap delivery status risks value proposition"
     rag_docs = query_vector_db(
         vector_client,
         embedding_func,
-        "strategic overview contract commitments roadmap delivery status risks value proposition",
+        context_query,
         customer_filter=customer_name,
         n_results=12
     )
-    rag_context = "\n\n".join(doc["text"] for doc in rag_docs) if rag_docs else ""
+    context_docs, _ = select_context(context_query, rag_docs, embedding_func)
+    rag_context = "\n\n".join(doc["text"] for doc in context_docs)
 
     task = f"""You are a professional sales strategist generating a 7-slide pitch deck in strict JSON format.
 
@@ -87,7 +90,7 @@ Medium risk items: {risk_data.get("MEDIUM", 0)}
 Low risk items: {risk_data.get("LOW", 0)}
 
 Relevant context:
-{rag_context[:6000]}
+{rag_context}
 
 Generate the JSON now:"""
 
@@ -0,0 +1,99 @@
+# logic/portfolio_risk.py
+# Portfolio-wide comparison + risk: every customer (or a filtered set) in one pass.
+# Contracts and resolved release statuses are loaded with two queries and scored
+# with the same vectorized rules as risk_analysis_agent.
+#
+#   python -m logic.portfolio_risk [--customer NAME ...] [--rollups out.csv] [--details out.csv]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from db.db_utils import (
+    init_db,
+    load_customer_names,
+    load_contracts_for_customers,
+    load_latest_status_for_customers,
+    RISK_LEVELS,
+)
+from logic.risk_engine import assess_risk
+from utils.utils import STATUS_LABELS
+
+RISK_FRAME_COLUMNS = [
+    "customer_name", "feature_id", "feature_name", "description", "priority",
+    "status", "risk_level", "risk_reason"
+]
+ROLLUP_COLUMNS = ["customer_name", "features", *STATUS_LABELS, *RISK_LEVELS]
+
+
+def portfolio_risk_frame(contracts: pd.DataFrame, statuses: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tidy multi-customer risk frame, one row per (customer_name, feature_id).
+    Equivalent to compare_features_agent + risk_analysis_agent run per customer.
+    """
+    frame = contracts.drop_duplicates(subset=["customer_name", "feature_id"])
+    frame = frame.merge(statuses, on=["customer_name", "feature_id"], how="left")
+
+    # Features without any ranked release row are Missing (rank 0)
+    ranks = frame.pop("status_rank").fillna(0).to_numpy(dtype=np.int8)
+    frame["status"] = np.array(STATUS_LABELS, dtype=object)[ranks]
+    frame["risk_level"], frame["risk_reason"] = assess_risk(frame)
+    return frame.reindex(columns=RISK_FRAME_COLUMNS).reset_index(drop=True)
+
+
+def portfolio_rollups(frame: pd.DataFrame, customers: list) -> pd.DataFrame:
+    """Per-customer feature, status and risk counts; customers without contracts get zeros"""
+    def counts(column, labels):
+        return (
+            frame.groupby("customer_name")[column].value_counts()
+            .unstack(fill_value=0)
+            .reindex(index=customers, columns=labels, fill_value=0)
+        )
+
+    rollups = pd.concat([counts("status", STATUS_LABELS), counts("risk_level", RISK_LEVELS)], axis=1)
+    rollups.insert(0, "features", rollups[STATUS_LABELS].sum(axis=1))
+    rollups = rollups.fillna(0).astype(int).rename_axis("customer_name").reset_index()
+    return rollups.sort_values(
+        ["HIGH", "MEDIUM", "customer_name"], ascending=[False, False, True]
+    ).reset_index(drop=True)[ROLLUP_COLUMNS]
+
+
+def compute_portfolio_risk(customers=None):
+    """
+    Compute status and risk for all customers (or the given ones).
+    Returns (risk_frame, rollups): the tidy per-feature frame and per-customer counts.
+    """
+    if customers is None:
+        customers = sorted(load_customer_names())
+    else:
+        customers = list(dict.fromkeys(customers))
+
+    contracts = load_contracts_for_customers(customers)
+    statuses = load_latest_status_for_customers(customers)
+    frame = portfolio_risk_frame(contracts, statuses)
+    return frame, portfolio_rollups(frame, customers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Portfolio-wide feature risk report")
+    parser.add_argument("--customer", action="append", help="limit to a customer (repeatable)")
+    parser.add_argument("--rollups", help="write per-customer rollups to this CSV")
+    parser.add_argument("--details", help="write the per-feature risk frame to this CSV")
+    parser.add_argument("--top", type=int, default=20, help="rows of rollups to print")
+    args = parser.parse_args(argv)
+
+    init_db()
+    frame, rollups = compute_portfolio_risk(args.customer)
+
+    if args.rollups:
+        rollups.to_csv(args.rollups, index=False)
+    if args.details:
+        frame.to_csv(args.details, index=False)
+
+    print(f"{len(rollups)} customers, {len(frame)} contract features")
+    print(rollups.head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
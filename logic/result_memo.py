@@ -0,0 +1,99 @@
+# logic/result_memo.py
+# In-process memo for per-customer results, keyed on (kind, customer, data version).
+# Streamlit reruns app.py on every interaction; results are only recomputed
+# after a write bumps the customer's data version in db_utils.
+
+import os
+import threading
+from collections import OrderedDict
+
+from db.db_utils import (
+    get_data_version,
+    load_contracts_for_customer,
+    load_all_releases_for_customer,
+)
+from logic.risk_snapshot import load_customer_risk
+from logic.sales_context import build_sales_context
+
+RESULT_MEMO_SIZE = int(os.getenv("RESULT_MEMO_SIZE", "256"))
+
+
+class VersionedMemo:
+    """
+    Bounded LRU of computed results. Entries for an older data version are never
+    hit again and age out; a customer's newer entry replaces its older one.
+    """
+
+    def __init__(self, max_entries: int = RESULT_MEMO_SIZE):
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, kind: str, customer_name: str, version: int, compute):
+        key = (kind, customer_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Computed outside the lock; concurrent misses for the same key just both compute
+        value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+_memo = VersionedMemo()
+
+
+def get_result_memo() -> VersionedMemo:
+    """Process-wide memo shared by every Streamlit session"""
+    return _memo
+
+
+def memoized_customer_risk(customer_name: str):
+    """(comparison, risk_data) for a customer, recomputed only when its data version changes"""
+    version = get_data_version(customer_name)
+    return _memo.get_or_compute("risk", customer_name, version, lambda: load_customer_risk(customer_name))
+
+
+def memoized_sales_context(customer_name: str) -> str:
+    """Chat context for a customer, rebuilt only when its data version changes"""
+    version = get_data_version(customer_name)
+
+    def compute():
+        comparison, risk_data = memoized_customer_risk(customer_name)
+        return build_sales_context(
+            load_contracts_for_customer(customer_name),
+            load_all_releases_for_customer(customer_name),
+            comparison,
+            risk_data
+        )
+
+    return _memo.get_or_compute("sales_context", customer_name, version, compute)
@@ -1,11 +1,161 @@
 # automated_sales_enablement/logic/risk_engine.py
 
+import os
 import asyncio
 import json
+import numpy as np
 import pandas as pd
 from autogen_agentchat.agents import AssistantAgent
 
-def risk_analysis_agent(agent: AssistantAgent, comparison_result: dict) -> dict:
+from db.db_utils import RISK_LEVELS
+
+# Rules file; point this at another file for a business unit with different rules
+RISK_RULES_PATH = os.getenv(
+    "RISK_RULES_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "risk_rules.json")
+)
+
+
+def _column_values(frame: pd.DataFrame, column: str, ignore_case: bool, cache: dict) -> pd.Series:
+    """str()-and-strip a column once per evaluation; a missing column reads as ''"""
+    key = (column, ignore_case)
+    if key not in cache:
+        if column in frame.columns:
+            values = frame[column].astype(str).str.strip()
+        else:
+            values = pd.Series("", index=frame.index, dtype=object)
+        cache[key] = values.str.lower() if ignore_case else values
+    return cache[key]
+
+
+def _numeric_values(frame: pd.DataFrame, column: str, cache: dict) -> pd.Series:
+    key = (column, "numeric")
+    if key not in cache:
+        if column in frame.columns:
+            cache[key] = pd.to_numeric(frame[column], errors="coerce")
+        else:
+            cache[key] = pd.Series(np.nan, index=frame.index)
+    return cache[key]
+
+
+def _compile_condition(rule_name: str, column: str, spec: dict):
+    """Compile one column condition into a function frame, cache -> boolean array"""
+    spec = dict(spec)
+    ignore_case = bool(spec.pop("ignore_case", False))
+    if len(spec) != 1:
+        raise ValueError(f"Risk rule '{rule_name}': condition on '{column}' needs exactly one operator")
+    op, value = next(iter(spec.items()))
+
+    def fold(v):
+        v = str(v).strip()
+        return v.lower() if ignore_case else v
+
+    if op in ("in", "not_in"):
+        values = [fold(v) for v in value]
+        negate = op == "not_in"
+        return lambda frame, cache: _column_values(frame, column, ignore_case, cache).isin(values).to_numpy() ^ negate
+    if op in ("equals", "not_equals"):
+        target = fold(value)
+        negate = op == "not_equals"
+        return lambda frame, cache: (_column_values(frame, column, ignore_case, cache) == target).to_numpy() ^ negate
+    if op == "matches":
+        pattern = str(value)
+        return lambda frame, cache: _column_values(frame, column, ignore_case, cache) \
+            .str.contains(pattern, case=not ignore_case, regex=True).to_numpy()
+    if op in ("gt", "gte", "lt", "lte"):
+        compare = {"gt": np.greater, "gte": np.greater_equal, "lt": np.less, "lte": np.less_equal}[op]
+        bound = float(value)
+        return lambda frame, cache: compare(_numeric_values(frame, column, cache).to_numpy(dtype=float), bound)
+    raise ValueError(f"Risk rule '{rule_name}': unknown operator '{op}' on '{column}'")
+
+
+_OPERATOR_TEXT = {
+    "in": "is one of", "not_in": "is not one of", "equals": "is", "not_equals": "is not",
+    "matches": "matches", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+}
+
+
+def _describe_condition(column: str, spec: dict) -> str:
+    spec = dict(spec)
+    case = " (any case)" if spec.pop("ignore_case", False) else ""
+    op, value = next(iter(spec.items()))
+    if isinstance(value, list):
+        value = ", ".join(map(str, value))
+    return f"{column} {_OPERATOR_TEXT[op]} {value}{case}"
+
+
+class RiskRules:
+    """
+    Ordered risk rules compiled to vectorized masks; the first matching rule sets a
+    feature's risk level and reason, unmatched features get the default.
+    """
+
+    def __init__(self, config: dict):
+        self.name = config.get("name", "custom")
+        self.rules = config["rules"]
+        self.default = config["default"]
+        for rule in [*self.rules, self.default]:
+            if rule["level"] not in RISK_LEVELS:
+                raise ValueError(f"Risk rule '{rule.get('name')}': level must be one of {RISK_LEVELS}")
+
+        self.rule_names = [rule["name"] for rule in self.rules] + [self.default.get("name", "default")]
+        self._levels = np.array([rule["level"] for rule in self.rules] + [self.default["level"]], dtype=object)
+        self._reasons = np.array([rule["reason"] for rule in self.rules] + [self.default["reason"]], dtype=object)
+        self._conditions = [
+            [_compile_condition(rule["name"], column, spec) for column, spec in rule.get("when", {}).items()]
+            for rule in self.rules
+        ]
+
+    def evaluate(self, frame: pd.DataFrame):
+        """Return (risk_level, risk_reason, rule_index) arrays aligned with frame's rows"""
+        cache = {}
+        masks = []
+        for conditions in self._conditions:
+            mask = np.ones(len(frame), dtype=bool)
+            for condition in conditions:
+                mask &= condition(frame, cache)
+            masks.append(mask)
+        rule_index = np.select(masks, np.arange(len(masks)), default=len(masks)) if masks \
+            else np.full(len(frame), len(masks))
+        return self._levels[rule_index], self._reasons[rule_index], rule_index
+
+    def matched_rules(self, rule_index: np.ndarray) -> np.ndarray:
+        """Name of the rule that decided each row"""
+        return np.array(self.rule_names, dtype=object)[rule_index]
+
+    def hit_breakdown(self, rule_index: np.ndarray) -> dict:
+        """{rule name: rows it decided}, in rule order, default last"""
+        counts = np.bincount(rule_index, minlength=len(self.rule_names))
+        return {name: int(count) for name, count in zip(self.rule_names, counts)}
+
+    def describe(self) -> str:
+        """Plain-language rule list, e.g. for an agent system prompt"""
+        lines = ["Assign each feature a risk level with these rules (first match wins):"]
+        for i, rule in enumerate(self.rules, start=1):
+            conditions = " and ".join(_describe_condition(c, s) for c, s in rule.get("when", {}).items())
+            lines.append(f"{i}. If {conditions or 'always'}: {rule['level']} ({rule['reason']})")
+        lines.append(f"Otherwise: {self.default['level']} ({self.default['reason']})")
+        return "\n".join(lines)
+
+
+_compiled_rules = {}
+
+
+def load_risk_rules(path: str = None) -> RiskRules:
+    """Load and compile a rules file once per process (RISK_RULES_PATH by default)"""
+    path = os.path.abspath(path or RISK_RULES_PATH)
+    if path not in _compiled_rules:
+        with open(path, encoding="utf-8") as f:
+            _compiled_rules[path] = RiskRules(json.load(f))
+    return _compiled_rules[path]
+
+
+def assess_risk(summary_table: pd.DataFrame, rules: RiskRules = None):
+    """(risk_level, risk_reason) arrays for a frame with priority / status columns"""
+    levels, reasons, _ = (rules or load_risk_rules()).evaluate(summary_table)
+    return levels, reasons
+
+
+def risk_analysis_agent(agent: AssistantAgent, comparison_result: dict, rules: RiskRules = None) -> dict:
     """
     Returns structured risk data:
     {
@@ -14,41 +164,30 @@ def risk_analysis_agent(agent: AssistantAgent, comparison_result: dict) -> dict:
         "LOW": count,
         "NONE": count,
         "details": {feature_id: (risk_level, reason)},
+        "rule_hits": {rule name: features it decided},
+        "matched_rules": rule name per summary_table row,
         "summary_table": enhanced DataFrame with risk column
     }
+    Rules come from load_risk_rules() unless given.
     """
     summary_table = comparison_result["summary_table"]  # Should be pandas DataFrame
     
     if not isinstance(summary_table, pd.DataFrame):
         summary_table = pd.DataFrame(summary_table)
 
-    # Apply deterministic risk logic (fallback if LLM fails)
-    def assign_risk(row):
-        priority = str(row.get("priority", "")).strip().lower()
-        status = str(row.get("status", "")).strip()
-
-        if priority == "high" and status in ["Missing", "Not Released"]:
-            return "HIGH", "High-priority feature not yet released – escalation required"
-        elif priority == "high" and status == "Planned":
-            return "MEDIUM", "High-priority feature on roadmap but not live"
-        elif status in ["Missing", "Not Released"]:
-            return "MEDIUM", "Feature missing from current releases"
-        elif status == "Planned":
-            return "LOW", "Feature scheduled for future release"
-        else:
-            return "NONE", "Feature fully released and available"
-
-    summary_table[["risk_level", "risk_reason"]] = summary_table.apply(
-        lambda row: pd.Series(assign_risk(row)), axis=1
-    )
+    # Apply deterministic risk logic (fallback if LLM fails): compiled rules over whole columns
+    rules = rules or load_risk_rules()
+    levels, reasons, rule_index = rules.evaluate(summary_table)
+    summary_table["risk_level"] = levels
+    summary_table["risk_reason"] = reasons
 
     # Count risks
     risk_counts = summary_table["risk_level"].value_counts().to_dict()
     
-    details = {
-        row["feature_id"]: (row["risk_level"], row["risk_reason"])
-        for _, row in summary_table.iterrows()
-    }
+    details = dict(zip(
+        summary_table["feature_id"],
+        zip(summary_table["risk_level"], summary_table["risk_reason"])
+    ))
 
     return {
         "HIGH": risk_counts.get("HIGH", 0),
@@ -56,5 +195,7 @@ def risk_analysis_agent(agent: AssistantAgent, comparison_result: dict) -> dict:
         "LOW": risk_counts.get("LOW", 0),
         "NONE": risk_counts.get("NONE", 0),
         "details": details,
+        "rule_hits": rules.hit_breakdown(rule_index),
+        "matched_rules": rules.matched_rules(rule_index).tolist(),
         "summary_table": summary_table
     }
\ No newline at end of file
@@ -0,0 +1,164 @@
+# logic/risk_snapshot.py
+# Materialized per-customer comparison + risk results.
+# Recomputed at ingest time for the customers whose data changed; the
+# dashboard reads the stored snapshot instead of rerunning the pipeline.
+# Release files only re-score the features they touched (update_risk_snapshots);
+# verify_risk_snapshots() checks the stored result against a full recompute.
+#
+#   python -m logic.risk_snapshot --verify [--repair]
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from db.db_utils import (
+    load_contracts_for_customer,
+    load_latest_status_for_customer,
+    refresh_risk_snapshot,
+    load_risk_snapshot,
+    update_risk_snapshot_features,
+    load_customer_names,
+    init_db,
+    SNAPSHOT_COLUMNS,
+    RISK_LEVELS,
+)
+from logic.comparator import compare_features_agent
+from logic.risk_engine import risk_analysis_agent, load_risk_rules
+from utils.utils import STATUS_LABELS
+
+RISK_COLUMNS = ["risk_level", "risk_reason"]
+
+
+def compute_customer_risk(customer_name: str):
+    """Run the full comparison + risk pipeline for one customer"""
+    contract_df = load_contracts_for_customer(customer_name)
+    comparison = compare_features_agent(None, contract_df, load_latest_status_for_customer(customer_name))
+    risk_data = risk_analysis_agent(None, comparison)
+    return comparison, risk_data
+
+
+def _snapshot_of(customer_name: str):
+    _, risk_data = compute_customer_risk(customer_name)
+    return risk_data["summary_table"], risk_data
+
+
+def refresh_risk_snapshots(customers):
+    """Recompute and store the snapshot for each customer, each under the write lock"""
+    for customer_name in customers:
+        refresh_risk_snapshot(customer_name, lambda: _snapshot_of(customer_name))
+
+
+def _rescore(rows: pd.DataFrame) -> pd.DataFrame:
+    """New status / risk for snapshot rows from their current status_rank"""
+    # The same columns a full recompute's summary_table has, so rules on any of them agree
+    scored = rows[["feature_id", "feature_name", "description", "priority"]].copy()
+    scored["status"] = np.array(STATUS_LABELS, dtype=object)[rows["status_rank"].to_numpy(dtype=np.int8)]
+    rules = load_risk_rules()
+    scored["risk_level"], scored["risk_reason"], rule_index = rules.evaluate(scored)
+    scored["risk_rule"] = rules.matched_rules(rule_index)
+    return scored
+
+
+def update_risk_snapshots(changes: dict) -> int:
+    """
+    Apply release changes, {customer_name: changed feature_ids}, to the stored snapshots.
+    Only those features are re-scored and the counts adjusted by delta; customers
+    without a snapshot get a full recompute. Returns how many changed features were
+    applied incrementally.
+    """
+    rescored = 0
+    for customer_name, feature_ids in changes.items():
+        deltas = update_risk_snapshot_features(customer_name, feature_ids, _rescore)
+        if deltas is None:
+            refresh_risk_snapshots([customer_name])
+        else:
+            rescored += len(feature_ids)
+    return rescored
+
+
+def _comparable(summary_table: pd.DataFrame) -> pd.DataFrame:
+    return summary_table.reindex(columns=SNAPSHOT_COLUMNS).fillna("").astype(str).reset_index(drop=True)
+
+
+def verify_risk_snapshots(customers=None, repair: bool = False) -> list:
+    """
+    Consistency check: recompute each customer in full and compare with the stored snapshot.
+    Returns the customers whose snapshot differs (or is missing); repair=True rewrites them.
+    """
+    if customers is None:
+        customers = sorted(load_customer_names())
+
+    mismatched = []
+    for customer_name in customers:
+        _, risk_data = compute_customer_risk(customer_name)
+        snapshot = load_risk_snapshot(customer_name)
+        if snapshot is not None:
+            stored_table, stored_counts = snapshot
+            if (
+                _comparable(stored_table).equals(_comparable(risk_data["summary_table"]))
+                and all(stored_counts[level] == risk_data[level] for level in RISK_LEVELS)
+                and stored_counts["matched_rules"] == risk_data["matched_rules"]
+            ):
+                continue
+        mismatched.append(customer_name)
+        if repair:
+            refresh_risk_snapshots([customer_name])
+    return mismatched
+
+
+def _results_from_snapshot(summary_table, counts):
+    """Rebuild the comparison / risk_data dicts the pages expect from a stored snapshot"""
+    base = summary_table.drop(columns=RISK_COLUMNS)
+    comparison = {
+        "summary_table": summary_table,
+        "released": base[base["status"] == "Released"].reset_index(drop=True),
+        "planned": base[base["status"] == "Planned"].reset_index(drop=True),
+        "missing": base[base["status"] == "Missing"].reset_index(drop=True),
+    }
+    rule_hits = dict.fromkeys(load_risk_rules().rule_names, 0)
+    for rule in counts["matched_rules"]:
+        rule_hits[rule] = rule_hits.get(rule, 0) + 1
+    risk_data = {
+        **counts,
+        "rule_hits": rule_hits,
+        "details": dict(zip(
+            summary_table["feature_id"],
+            zip(summary_table["risk_level"], summary_table["risk_reason"])
+        )),
+        "summary_table": summary_table,
+    }
+    return comparison, risk_data
+
+
+def load_customer_risk(customer_name: str):
+    """
+    Return (comparison, risk_data) for a customer from the stored snapshot.
+    Databases that predate snapshots (or their rule names) are computed once and stored.
+    """
+    snapshot = load_risk_snapshot(customer_name)
+    # Snapshots stored before rule names were kept are recomputed once as well
+    if snapshot is None or None in snapshot[1]["matched_rules"]:
+        refresh_risk_snapshots([customer_name])
+        snapshot = load_risk_snapshot(customer_name)
+    return _results_from_snapshot(*snapshot)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Risk snapshot maintenance")
+    parser.add_argument("--verify", action="store_true", help="compare snapshots with a full recompute")
+    parser.add_argument("--repair", action="store_true", help="rewrite snapshots that differ")
+    parser.add_argument("--customer", action="append", help="limit to a customer (repeatable)")
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.verify or args.repair:
+        mismatched = verify_risk_snapshots(args.customer, repair=args.repair)
+        action = "repaired" if args.repair else "differ from a full recompute"
+        print(f"{len(mismatched)} snapshot(s) {action}" + (f": {', '.join(mismatched)}" if mismatched else ""))
+    else:
+        parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+# rag/embedding_cache.py
+# Persistent, content-addressed embedding cache shared by every embedding function.
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from db.connection import get_connection, transaction
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.db")
+EMBEDDING_CACHE_MAX_MB = float(os.getenv("EMBEDDING_CACHE_MAX_MB", "512"))
+
+# Query embeddings kept in memory; misses fall back to the disk cache when enabled
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", "512"))
+QUERY_EMBED_CACHE_DISK = os.getenv("QUERY_EMBED_CACHE_DISK", "1").lower() in ("1", "true", "yes")
+
+# When the cache grows past its limit, evict least-recently-used entries
+# until it is back under this fraction of the limit.
+EVICTION_TARGET_RATIO = 0.9
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed cache keyed on (model name, SHA-256 of the text).
+    Vectors are stored as float32 blobs; total size is bounded by max_bytes
+    with least-recently-used eviction.
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = None):
+        self.path = path
+        self.max_bytes = int(max_bytes if max_bytes is not None else EMBEDDING_CACHE_MAX_MB * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        with transaction(path) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+            )
+        self._total_bytes = get_connection(path).execute(
+            "SELECT COALESCE(SUM(size), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Return a list aligned with texts: the cached vector, or None on a miss"""
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+
+        with self._lock:
+            unique = list(dict.fromkeys(hashes))
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                part = unique[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = get_connection(self.path).execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *part]
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                with transaction(self.path) as conn:
+                    conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, h) for h in found]
+                    )
+
+            results = [found.get(h) for h in hashes]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+
+        return results
+
+    def put_many(self, model: str, texts: list, vectors: list):
+        now = time.time()
+        records = []
+        for text, vector in zip(texts, vectors):
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            records.append((model, text_hash(text), blob, len(blob), now))
+
+        with self._lock:
+            with transaction(self.path) as conn:
+                for model_name, h, blob, size, ts in records:
+                    old = conn.execute(
+                        "SELECT size FROM embeddings WHERE model = ? AND text_hash = ?",
+                        (model_name, h)
+                    ).fetchone()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_access) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (model_name, h, blob, size, ts)
+                    )
+                    self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used entries until under the eviction target. Caller holds the lock."""
+        target = int(self.max_bytes * EVICTION_TARGET_RATIO)
+        with transaction(self.path) as conn:
+            while self._total_bytes > target:
+                rows = conn.execute(
+                    "SELECT model, text_hash, size FROM embeddings ORDER BY last_access LIMIT 256"
+                ).fetchall()
+                if not rows:
+                    self._total_bytes = 0
+                    break
+                for model, h, size in rows:
+                    if self._total_bytes <= target:
+                        break
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE model = ? AND text_hash = ?", (model, h)
+                    )
+                    self._total_bytes -= size
+                    self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "size_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+def cached_embed(cache: EmbeddingCache, model: str, texts: list, embed_fn) -> list:
+    """Embed texts through the cache; only misses are passed to embed_fn"""
+    vectors = cache.get_many(model, texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+
+    if missing:
+        # Duplicate texts within one call only need to be embedded once
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        fresh = embed_fn(unique_texts)
+        cache.put_many(model, unique_texts, fresh)
+        by_text = dict(zip(unique_texts, fresh))
+        for i in missing:
+            vectors[i] = list(by_text[texts[i]])
+
+    return vectors
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide cache instance shared by app.py and rag_engine"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+
+class QueryEmbeddingLRU:
+    """
+    Bounded in-process LRU of query embeddings keyed on (model, query text).
+    Misses are looked up in the disk cache (if given) before calling embed_fn,
+    so repeated queries skip the network across reruns and restarts.
+    """
+
+    def __init__(self, max_entries: int = QUERY_EMBED_CACHE_SIZE, disk: EmbeddingCache = None):
+        self.max_entries = max(1, max_entries)
+        self.disk = disk
+        self.lookups = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.network_calls = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, query: str, embed_fn) -> list:
+        """Embedding for query; embed_fn(list_of_texts) is only called on a full miss"""
+        key = (model, query)
+        with self._lock:
+            self.lookups += 1
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+        vector = self.disk.get_many(model, [query])[0] if self.disk is not None else None
+        if vector is not None:
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            vector = list(embed_fn([query])[0])
+            with self._lock:
+                self.network_calls += 1
+            if self.disk is not None:
+                self.disk.put_many(model, [query], [vector])
+
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            local = self.memory_hits + self.disk_hits
+            return {
+                "lookups": self.lookups,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "network_calls": self.network_calls,
+                "skipped_network_rate": (local / self.lookups) if self.lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+_query_cache = None
+
+
+def get_query_embedding_cache() -> QueryEmbeddingLRU:
+    """Process-wide query LRU, backed by the shared disk cache unless QUERY_EMBED_CACHE_DISK=0"""
+    global _query_cache, _shared_cache
+    with _shared_lock:
+        if _query_cache is None:
+            disk = None
+            if QUERY_EMBED_CACHE_DISK:
+                # Same instance as get_embedding_cache(), so size accounting stays in one place
+                if _shared_cache is None:
+                    _shared_cache = EmbeddingCache()
+                disk = _shared_cache
+            _query_cache = QueryEmbeddingLRU(disk=disk)
+        return _query_cache
@@ -0,0 +1,222 @@
+# rag/embedding_dispatcher.py
+# Concurrent, rate-limited OpenAI embedding requests with retry/backoff and
+# adaptive batch sizing. Used behind OpenAIEmbedding for cache misses.
+
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+from openai import AsyncOpenAI
+
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_RPM = float(os.getenv("EMBED_RPM", "3000"))
+EMBED_TPM = float(os.getenv("EMBED_TPM", "1000000"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) used for TPM limiting"""
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, holding at most capacity tokens.
+    Safe to share across threads and event loops.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _try_take(self, amount: float) -> float:
+        """Take amount tokens if available; otherwise return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    async def acquire(self, amount: float = 1.0):
+        # A single request larger than the bucket would wait forever; let it through when full
+        amount = min(amount, self.capacity)
+        while True:
+            wait = self._try_take(amount)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_after(error: Exception):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def run_sync(coro):
+    """Run a coroutine from sync code, even when called inside a running event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # e.g. query_vector_db called from generate_pitch_deck_content: use a helper thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+class AsyncEmbeddingDispatcher:
+    """
+    Splits texts into batches and sends them with up to `concurrency` requests in flight.
+    Requests and tokens per minute are limited by token buckets. 429/5xx/connection
+    errors are retried with exponential backoff and jitter.
+
+    Batch size adapts AIMD-style: it is halved on every retryable error, shrunk when
+    a request is slower than target_latency, and grown additively after fast successes.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        api_key: str = None,
+        base_url: str = None,
+        concurrency: int = EMBED_CONCURRENCY,
+        requests_per_minute: float = EMBED_RPM,
+        tokens_per_minute: float = EMBED_TPM,
+        max_batch_size: int = 256,
+        min_batch_size: int = 8,
+        batch_step: int = 16,
+        target_latency: float = 2.0,
+        max_retries: int = 6,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        self.model_name = model_name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.concurrency = max(1, concurrency)
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = min(min_batch_size, max_batch_size)
+        self.batch_step = batch_step
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "retries": 0, "errors": 0, "latency_total": 0.0}
+
+    # ---------------- adaptive batch size ----------------
+
+    def _on_success(self, latency: float):
+        with self._lock:
+            if latency > self.target_latency:
+                self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
+            else:
+                self.batch_size = min(self.max_batch_size, self.batch_size + self.batch_step)
+
+    def _on_error(self):
+        with self._lock:
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+
+    def _record(self, **deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._stats[key] += value
+
+    # ---------------- request path ----------------
+
+    async def _send(self, client: AsyncOpenAI, texts: list) -> list:
+        await self.request_bucket.acquire(1)
+        await self.token_bucket.acquire(sum(estimate_tokens(t) for t in texts))
+        response = await client.embeddings.create(model=self.model_name, input=texts)
+        # The API returns items with an index; don't rely on response order
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def _worker(self, client: AsyncOpenAI, pending: deque, results: list):
+        failures = 0
+        while pending:
+            batch = []
+            while pending and len(batch) < self.batch_size:
+                batch.append(pending.popleft())
+            texts = [t for _, t in batch]
+
+            started = time.monotonic()
+            try:
+                vectors = await self._send(client, texts)
+            except Exception as e:
+                if not _is_retryable(e) or failures >= self.max_retries:
+                    self._record(errors=1)
+                    raise
+                # Put the batch back; it will be re-split at the reduced batch size
+                pending.extendleft(reversed(batch))
+                failures += 1
+                self._on_error()
+                self._record(retries=1)
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_backoff, self.base_backoff * (2 ** (failures - 1)))
+                    delay *= random.uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+                continue
+
+            latency = time.monotonic() - started
+            failures = 0
+            self._on_success(latency)
+            self._record(requests=1, texts=len(texts), latency_total=latency)
+            for (index, _), vector in zip(batch, vectors):
+                results[index] = vector
+
+    async def aembed(self, texts: list) -> list:
+        if not texts:
+            return []
+        results = [None] * len(texts)
+        pending = deque(enumerate(texts))
+
+        # A fresh client per call: the async HTTP pool is bound to the running loop
+        async with AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0) as client:
+            workers = [
+                asyncio.create_task(self._worker(client, pending, results))
+                for _ in range(min(self.concurrency, len(texts)))
+            ]
+            try:
+                await asyncio.gather(*workers)
+            except Exception:
+                for w in workers:
+                    w.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                raise
+
+        return results
+
+    def embed(self, texts: list) -> list:
+        return run_sync(self.aembed(list(texts)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["batch_size"] = self.batch_size
+        stats["avg_latency"] = stats["latency_total"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
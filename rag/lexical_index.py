@@ -0,0 +1,189 @@
+# rag/lexical_index.py
+# BM25 inverted index over the same chunks that go into Chroma, plus an exact
+# feature_id lookup. Built at ingest time; used by hybrid retrieval in rag_engine.
+
+import os
+import re
+import math
+import threading
+from collections import Counter, defaultdict
+
+from db.connection import get_connection, transaction
+
+LEXICAL_INDEX_PATH = os.getenv("LEXICAL_INDEX_PATH", "data/lexical_index.db")
+
+# Standard Okapi BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD = re.compile(r"[a-z0-9]+")
+# Identifier-like tokens kept whole as well as split, e.g. "f-204" -> "f-204", "f", "204"
+_COMPOUND = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)+")
+# Candidate feature ids in a question: a token with at least one digit, e.g. F-204, FEAT_12, 1042
+_ID_CANDIDATE = re.compile(r"\b[A-Za-z]*[-_]?\d+[A-Za-z0-9_-]*\b")
+
+
+def tokenize(text: str) -> list:
+    text = str(text).lower()
+    return _WORD.findall(text) + _COMPOUND.findall(text)
+
+
+def feature_id_candidates(query: str) -> list:
+    return list(dict.fromkeys(m.group(0) for m in _ID_CANDIDATE.finditer(query)))
+
+
+class LexicalIndex:
+    """
+    SQLite-backed inverted index: chunks(doc_id, text, metadata) and
+    postings(term, doc_id, tf). Chunk ids are the same content hashes Chroma uses.
+    """
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with transaction(path) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_id TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                type TEXT,
+                customer_name TEXT,
+                feature_id TEXT,
+                length INTEGER NOT NULL
+            )
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_chunks_customer ON chunks (customer_name)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_chunks_feature ON chunks (feature_id COLLATE NOCASE, customer_name)"
+            )
+
+    def add(self, texts: list, metadatas: list, ids: list) -> int:
+        """Index chunks not seen before; returns how many were added"""
+        with self._lock, transaction(self.path) as conn:
+            added = 0
+            for text, meta, doc_id in zip(texts, metadatas, ids):
+                meta = meta or {}
+                terms = Counter(tokenize(text))
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO chunks (doc_id, text, type, customer_name, feature_id, length) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (doc_id, text, meta.get("type"), meta.get("customer_name"),
+                     None if meta.get("feature_id") is None else str(meta.get("feature_id")),
+                     sum(terms.values()))
+                )
+                if cur.rowcount == 0:
+                    continue
+                conn.executemany(
+                    "INSERT OR IGNORE INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                    [(term, doc_id, tf) for term, tf in terms.items()]
+                )
+                added += 1
+        return added
+
+    def _where(self, customer_name: str, doc_type: str, alias: str = "c") -> tuple:
+        conditions, params = [], []
+        if customer_name is not None:
+            conditions.append(f"{alias}.customer_name = ?")
+            params.append(customer_name)
+        if doc_type is not None:
+            conditions.append(f"{alias}.type = ?")
+            params.append(doc_type)
+        return "".join(f" AND {c}" for c in conditions), params
+
+    def search(self, query: str, customer_name: str = None, doc_type: str = None, n_results: int = 10) -> list:
+        """BM25-ranked doc_ids for query, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        conn = get_connection(self.path)
+        placeholders = ",".join("?" * len(terms))
+
+        total, avg_length = conn.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+        if not total:
+            return []
+        doc_freq = dict(conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+        ).fetchall())
+
+        extra, params = self._where(customer_name, doc_type)
+        rows = conn.execute(f"""
+        SELECT p.term, p.doc_id, p.tf, c.length
+        FROM postings p JOIN chunks c ON c.doc_id = p.doc_id
+        WHERE p.term IN ({placeholders}){extra}
+        """, [*terms, *params]).fetchall()
+
+        scores = defaultdict(float)
+        for term, doc_id, tf, length in rows:
+            df = doc_freq.get(term, 0)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / (avg_length or 1))
+            scores[doc_id] += idf * tf * (BM25_K1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [doc_id for doc_id, _ in ranked[:n_results]]
+
+    def lookup_feature_ids(self, query: str, customer_name: str = None, doc_type: str = None,
+                           n_results: int = 10) -> list:
+        """doc_ids of chunks whose feature_id appears verbatim (any case) in the query"""
+        candidates = feature_id_candidates(query)
+        if not candidates:
+            return []
+        extra, params = self._where(customer_name, doc_type, alias="chunks")
+        rows = get_connection(self.path).execute(f"""
+        SELECT doc_id FROM chunks
+        WHERE feature_id COLLATE NOCASE IN ({','.join('?' * len(candidates))}){extra}
+        ORDER BY type, doc_id
+        LIMIT ?
+        """, [*candidates, *params, n_results]).fetchall()
+        return [r[0] for r in rows]
+
+    def get_chunks(self, doc_ids: list) -> dict:
+        """{doc_id: (text, metadata)} for the given ids"""
+        if not doc_ids:
+            return {}
+        rows = get_connection(self.path).execute(
+            f"SELECT doc_id, text, type, customer_name, feature_id FROM chunks "
+            f"WHERE doc_id IN ({','.join('?' * len(doc_ids))})",
+            list(doc_ids)
+        ).fetchall()
+        return {
+            doc_id: (text, {"type": doc_type, "customer_name": customer, "feature_id": feature_id})
+            for doc_id, text, doc_type, customer, feature_id in rows
+        }
+
+    def count(self) -> int:
+        return get_connection(self.path).execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def clear(self):
+        with self._lock, transaction(self.path) as conn:
+            conn.execute("DELETE FROM postings")
+            conn.execute("DELETE FROM chunks")
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """Fuse ranked id lists: score(id) = sum of 1 / (k + rank) over the lists it appears in"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: -item[1])]
+
+
+_shared_index = None
+_shared_lock = threading.Lock()
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Process-wide index instance shared by ingestion and retrieval"""
+    global _shared_index
+    with _shared_lock:
+        if _shared_index is None:
+            _shared_index = LexicalIndex()
+        return _shared_index
@@ -2,90 +2,552 @@
 # Updated: OpenAI v1 + ChromaDB v0.4.24+ compliant
 
 import os
+import re
 import hashlib
+import time
+import logging
+import threading
+import numpy as np
 from dotenv import load_dotenv
 
-import chromadb
-from chromadb.api.types import EmbeddingFunction
-from openai import OpenAI
+from rag.embedding_cache import EmbeddingCache, cached_embed, get_embedding_cache, get_query_embedding_cache
+from rag.embedding_dispatcher import AsyncEmbeddingDispatcher, estimate_tokens
+from rag.lexical_index import LexicalIndex, get_lexical_index, reciprocal_rank_fusion
+from rag.retrieval_cache import get_retrieval_cache
+from rag.vector_shards import VECTOR_SHARDING, VECTOR_SHARD_BUCKETS, ShardedCollection
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# "openai" (text-embedding-3-small via the API) or "local" (sentence-transformers on CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "openai").lower()
+OPENAI_EMBEDDING_MODEL = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+# CPU threads torch may use for local inference
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", str(min(4, os.cpu_count() or 1))))
+
+CHROMA_PATH = os.getenv("CHROMA_PATH", "data/chroma")
+
+# Vectors from different models must never share a collection. The OpenAI
+# default keeps the original collection name so existing data stays usable.
+COLLECTION_NAME = "sales_features"
+
+
+# The embedding classes satisfy chromadb's EmbeddingFunction protocol
+# (__call__(self, input)) without subclassing it, so importing this module
+# does not import chromadb.
+
 
-class OpenAIEmbedding(EmbeddingFunction):
+class OpenAIEmbedding:
     """Custom embedding function compatible with ChromaDB v0.4.24+"""
-    def __init__(self, model_name="text-embedding-3-small"):
+    def __init__(self, model_name="text-embedding-3-small", cache: EmbeddingCache = None):
         self.model_name = model_name
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.cache = cache if cache is not None else get_embedding_cache()
+        # Concurrent, rate-limited requests with backoff on 429/5xx
+        self.dispatcher = AsyncEmbeddingDispatcher(model_name, api_key=OPENAI_API_KEY)
+
+    def embed_uncached(self, texts):
+        """Embed texts with the API, bypassing the cache"""
+        return self.dispatcher.embed(texts)
 
     def __call__(self, input):
-        # input: list of strings
-        response = self.client.embeddings.create(
-            model=self.model_name,
-            input=input
-        )
-        return [item.embedding for item in response.data]
+        # input: list of strings; only cache misses go to the API
+        return cached_embed(self.cache, self.model_name, list(input), self.embed_uncached)
 
 
-def get_vector_client_and_collection():
-    """Initialize Chroma client and collection with OpenAI v1 embeddings"""
+_local_models = {}
+_local_models_lock = threading.Lock()
 
-    # Initialize Chroma persistent client
-    client = chromadb.PersistentClient(path="data/chroma")
 
-    # Initialize our custom embedding function
-    embedding_func = OpenAIEmbedding(model_name="text-embedding-3-small")
+def _load_local_model(model_name: str):
+    """Load a sentence-transformers model once per process, capped at EMBEDDING_THREADS"""
+    with _local_models_lock:
+        if model_name not in _local_models:
+            import torch
+            from sentence_transformers import SentenceTransformer
 
-    # Get or create collection
-    collection = client.get_or_create_collection(
-        name="sales_features",
-        embedding_function=embedding_func
-    )
+            torch.set_num_threads(max(1, EMBEDDING_THREADS))
+            _local_models[model_name] = (SentenceTransformer(model_name, device="cpu"), threading.Lock())
+        return _local_models[model_name]
+
+
+class LocalEmbedding:
+    """sentence-transformers embeddings computed on CPU; no API key or network needed"""
+    def __init__(self, model_name=LOCAL_EMBEDDING_MODEL, batch_size=LOCAL_EMBEDDING_BATCH_SIZE,
+                 cache: EmbeddingCache = None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.cache = cache if cache is not None else get_embedding_cache()
+
+    def embed_uncached(self, texts):
+        model, lock = _load_local_model(self.model_name)
+        # One encode at a time per model: torch already spreads a batch over EMBEDDING_THREADS
+        with lock:
+            vectors = model.encode(
+                list(texts),
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        return vectors.tolist()
+
+    def __call__(self, input):
+        return cached_embed(self.cache, self.model_name, list(input), self.embed_uncached)
+
+
+def get_embedding_function(backend: str = None):
+    """Embedding function for EMBEDDING_BACKEND (or the given backend)"""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == "local":
+        return LocalEmbedding()
+    if backend == "openai":
+        return OpenAIEmbedding(model_name=OPENAI_EMBEDDING_MODEL)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected 'openai' or 'local')")
+
+
+def collection_name_for(embedding_func) -> str:
+    """Chroma collection holding vectors from this embedding function's model"""
+    model_name = getattr(embedding_func, "model_name", type(embedding_func).__name__)
+    if model_name == "text-embedding-3-small":
+        return COLLECTION_NAME
+    slug = re.sub(r'[^A-Za-z0-9_-]+', '-', model_name).strip('-_')
+    # Chroma names: at most 63 characters, ending in a letter or digit
+    return f"{COLLECTION_NAME}__{slug}"[:63].rstrip('-_')
+
+
+class VectorStore:
+    """
+    Chroma client, embedding function and collection for one persist path,
+    each built on first use. Construction itself does no I/O.
+    With sharding "customer" or "bucket", collection routes over shard collections.
+    """
+
+    def __init__(self, path: str = CHROMA_PATH, embedding_func=None,
+                 sharding: str = VECTOR_SHARDING, buckets: int = VECTOR_SHARD_BUCKETS):
+        self.path = path
+        self.sharding = sharding
+        self.buckets = buckets
+        self._client = None
+        self._collection = None
+        self._sharded = None
+        self._embedding_func = embedding_func
+        self._lock = threading.RLock()
+        # Seconds spent building each part, for the startup benchmark
+        self.timings = {}
+
+    def _timed(self, part: str, build):
+        start = time.perf_counter()
+        value = build()
+        self.timings[part] = time.perf_counter() - start
+        return value
 
-    return client, collection, embedding_func
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                def build():
+                    import chromadb
+                    return chromadb.PersistentClient(path=self.path)
+                self._client = self._timed("client", build)
+            return self._client
 
+    @property
+    def embedding_func(self):
+        with self._lock:
+            if self._embedding_func is None:
+                self._embedding_func = self._timed("embedding_func", get_embedding_function)
+            return self._embedding_func
 
-# Global instances (used across the app)
-client, collection, embedding_func = get_vector_client_and_collection()
+    @property
+    def collection(self):
+        """Where ingestion writes and retrieval reads"""
+        if self.sharding == "none":
+            return self.unsharded_collection
+        with self._lock:
+            if self._sharded is None:
+                embedding_func = self.embedding_func
+                self._sharded = ShardedCollection(
+                    self.client, embedding_func, collection_name_for(embedding_func), self.sharding, self.buckets
+                )
+            return self._sharded
+
+    @property
+    def unsharded_collection(self):
+        """The single collection holding every customer's chunks"""
+        with self._lock:
+            if self._collection is None:
+                client, embedding_func = self.client, self.embedding_func
+                self._collection = self._timed("collection", lambda: client.get_or_create_collection(
+                    name=collection_name_for(embedding_func),
+                    embedding_function=embedding_func
+                ))
+            return self._collection
+
+    def clear(self):
+        """Delete every collection through the live client (the next use recreates ours)"""
+        try:
+            with self._lock:
+                for existing in self.client.list_collections():
+                    self.client.delete_collection(getattr(existing, "name", existing))
+                self._collection = None
+                self._sharded = None
+        finally:
+            # Even if Chroma fails part-way, cached results may describe deleted chunks
+            get_retrieval_cache().clear()
+
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def get_vector_store() -> VectorStore:
+    """Process-wide vector store shared by the app, ingestion and retrieval"""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = VectorStore()
+        return _shared_store
+
+
+def get_vector_client_and_collection():
+    """Chroma client, collection and embedding function of the shared vector store"""
+    store = get_vector_store()
+    return store.client, store.collection, store.embedding_func
+
+
+def _default_embedding_func():
+    # The collection's own embedding function, for callers that pass none
+    return get_vector_store().embedding_func
 
 
 def ingest_to_vector_db(vector_client, embedding_func, text: str, metadata: dict):
-    """Ingest a single text chunk with metadata into Chroma"""
+    """Ingest a single text chunk with metadata into Chroma and the lexical index"""
     doc_id = hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    collection.add(
+    get_vector_store().collection.add(
         documents=[text],
         metadatas=[metadata],
         ids=[doc_id]
     )
+    get_lexical_index().add([text], [metadata], [doc_id])
+    get_retrieval_cache().bump([(metadata or {}).get("customer_name")])
 
 
-def query_vector_db(
+# Upper bounds for a single Chroma add. Embedding requests are sized separately
+# by the dispatcher (AsyncEmbeddingDispatcher.max_batch_size).
+EMBED_BATCH_SIZE = 256
+EMBED_BATCH_MAX_CHARS = 400_000
+
+
+def _iter_batches(texts, metadatas, batch_size, max_chars):
+    """Yield (texts, metadatas, ids) batches bounded by item count and total characters"""
+    batch_texts, batch_metas, batch_ids = [], [], []
+    batch_chars = 0
+    seen = set()
+
+    for text, meta in zip(texts, metadatas):
+        doc_id = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        # Chroma rejects duplicate ids within one add call; first occurrence wins,
+        # matching what sequential single-chunk adds used to do.
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+
+        if batch_texts and (len(batch_texts) >= batch_size or batch_chars + len(text) > max_chars):
+            yield batch_texts, batch_metas, batch_ids
+            batch_texts, batch_metas, batch_ids = [], [], []
+            batch_chars = 0
+
+        batch_texts.append(text)
+        batch_metas.append(meta)
+        batch_ids.append(doc_id)
+        batch_chars += len(text)
+
+    if batch_texts:
+        yield batch_texts, batch_metas, batch_ids
+
+
+def ingest_batch_to_vector_db(
     vector_client,
     embedding_func,
-    query: str,
-    customer_filter: str = None,
-    n_results: int = 10
-):
-    """Query the vector database."""
-    where = {"customer_name": customer_filter} if customer_filter else None
+    texts: list,
+    metadatas: list,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_chars: int = EMBED_BATCH_MAX_CHARS
+) -> int:
+    """
+    Ingest many text chunks with metadata into Chroma and the lexical index.
+    All texts are embedded with one call up front, so the dispatcher keeps
+    EMBED_CONCURRENCY requests in flight; the vectors are then written in adds of
+    at most batch_size items (split by customer shard when VECTOR_SHARDING is set).
+    vector_client may be a VectorStore to write to instead of the shared one.
+    Returns the number of chunks sent to the vector DB.
+    """
+    if len(texts) != len(metadatas):
+        raise ValueError("texts and metadatas must have the same length")
 
-    results = collection.query(
-        query_texts=[query],
+    store = vector_client if isinstance(vector_client, VectorStore) else get_vector_store()
+    batches = list(_iter_batches(texts, metadatas, batch_size, max_chars))
+    # The collection's own embedding function, so vectors match what queries use
+    embeddings = store.embedding_func([text for batch_texts, _, _ in batches for text in batch_texts])
+
+    collection = store.collection
+    lexical_index = get_lexical_index()
+    written = 0
+    for batch_texts, batch_metas, batch_ids in batches:
+        collection.add(
+            documents=batch_texts,
+            metadatas=batch_metas,
+            ids=batch_ids,
+            embeddings=embeddings[written:written + len(batch_texts)]
+        )
+        lexical_index.add(batch_texts, batch_metas, batch_ids)
+        # Cached retrievals for these customers are stale from here on
+        get_retrieval_cache().bump((meta or {}).get("customer_name") for meta in batch_metas)
+        written += len(batch_texts)
+
+    return written
+
+
+def embed_query(embedding_func, query: str) -> list:
+    """Query embedding through the process-wide query LRU (see get_query_embedding_cache)"""
+    model = getattr(embedding_func, "model_name", type(embedding_func).__name__)
+    # The LRU has its own disk fallback, so skip the embedding function's cache on a miss
+    embed_fn = getattr(embedding_func, "embed_uncached", embedding_func)
+    return get_query_embedding_cache().get(model, query, embed_fn)
+
+
+# "dense" (Chroma only), "lexical" (feature_id lookup + BM25) or "hybrid" (all three, RRF-fused)
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+
+def _dense_search(vector_collection, embedding_func, query: str, where, n_results: int) -> list:
+    """[(doc_id, text, metadata)] from Chroma, nearest first"""
+    results = vector_collection.query(
+        query_embeddings=[embed_query(embedding_func, query)],
         n_results=n_results,
         where=where,
         include=["documents", "metadatas"]
     )
-
     if not results.get("documents") or not results["documents"][0]:
         return []
+    return [
+        (doc_id, doc_text, meta or {})
+        for doc_id, doc_text, meta in zip(results["ids"][0], results["documents"][0], results["metadatas"][0])
+    ]
+
+
+def backfill_lexical_index(vector_collection, lexical_index: LexicalIndex, page_size: int = 1000) -> int:
+    """Index chunks that were added to Chroma before the lexical index existed"""
+    if lexical_index.count() >= vector_collection.count():
+        return 0
+    added, offset = 0, 0
+    while True:
+        page = vector_collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return added
+        added += lexical_index.add(page["documents"], page["metadatas"], page["ids"])
+        offset += len(page["ids"])
+
+
+def _chroma_where(customer_filter: str, doc_type: str):
+    conditions = [{"customer_name": customer_filter}] if customer_filter else []
+    if doc_type:
+        conditions.append({"type": doc_type})
+    if len(conditions) > 1:
+        return {"$and": conditions}
+    return conditions[0] if conditions else None
+
+
+def hybrid_search(
+    vector_collection,
+    lexical_index: LexicalIndex,
+    embedding_func,
+    query: str,
+    customer_filter: str = None,
+    n_results: int = 10,
+    mode: str = RETRIEVAL_MODE,
+    doc_type: str = None
+) -> list:
+    """
+    Retrieve chunks for query with the given mode (see RETRIEVAL_MODES).
+    Each ranker contributes up to 2 * n_results candidates; reciprocal-rank fusion
+    picks the final n_results. Returns [{"text", "metadata"}].
+    """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}' (expected one of {', '.join(RETRIEVAL_MODES)})")
+    where = _chroma_where(customer_filter, doc_type)
+    depth = n_results * 2
+
+    dense = []
+    if mode in ("dense", "hybrid"):
+        dense = _dense_search(vector_collection, embedding_func, query, where, depth if mode == "hybrid" else n_results)
+        if mode == "dense":
+            return [{"text": text, "metadata": meta} for _, text, meta in dense]
+
+    rankings = [
+        lexical_index.lookup_feature_ids(query, customer_filter, doc_type, n_results=depth),
+        lexical_index.search(query, customer_filter, doc_type, n_results=depth),
+    ]
+    if dense:
+        rankings.append([doc_id for doc_id, _, _ in dense])
+    fused = reciprocal_rank_fusion(rankings)[:n_results]
+
+    chunks = {doc_id: (text, meta) for doc_id, text, meta in dense}
+    chunks.update(lexical_index.get_chunks([doc_id for doc_id in fused if doc_id not in chunks]))
+    return [
+        {"text": chunks[doc_id][0], "metadata": chunks[doc_id][1] or {}}
+        for doc_id in fused if doc_id in chunks
+    ]
+
 
-    retrieved = []
-    for doc_text, meta in zip(results["documents"][0], results["metadatas"][0]):
-        retrieved.append({
-            "text": doc_text,
-            "metadata": meta or {}
-        })
+_lexical_backfilled = False
 
-    return retrieved
+
+def query_vector_db(
+    vector_client,
+    embedding_func,
+    query: str,
+    customer_filter: str = None,
+    n_results: int = 10,
+    mode: str = RETRIEVAL_MODE,
+    doc_type: str = None
+):
+    """
+    Query the vector database (hybrid dense + lexical retrieval unless mode says otherwise).
+    With VECTOR_SHARDING set, a customer_filter query searches only that customer's shard.
+    Results are served from the retrieval cache until the customer's vectors change.
+    """
+    global _lexical_backfilled
+    collection = get_vector_store().collection
+    lexical_index = get_lexical_index()
+    if not _lexical_backfilled and mode != "dense":
+        backfill_lexical_index(collection, lexical_index)
+        _lexical_backfilled = True
+
+    return get_retrieval_cache().get_or_compute(
+        customer_filter or None, query, n_results, doc_type, mode,
+        lambda: hybrid_search(
+            collection,
+            lexical_index,
+            embedding_func or _default_embedding_func(),
+            query,
+            customer_filter=customer_filter,
+            n_results=n_results,
+            mode=mode,
+            doc_type=doc_type
+        )
+    )
+
+
+# Post-retrieval context selection (select_context)
+# The pitch-deck prompt used to send its candidates joined and cut at this many
+# characters; tokens_saved is measured against that prompt
+PREVIOUS_CONTEXT_CHARS = 6000
+# About the previous prompt's size: savings come from dropping redundant chunks
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", str(PREVIOUS_CONTEXT_CHARS // 4)))
+# 1.0 ranks by relevance only; lower values favour chunks unlike those already chosen
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Cosine similarity at which a chunk counts as a near-duplicate of a chosen one
+# about the same subject (see _same_subject)
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.95"))
+
+
+def _unit_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _same_subject(docs: list) -> np.ndarray:
+    """
+    [i, j] is False when chunks i and j are about different features or are of
+    different types (a contract line and a release line complement each other).
+    Templated chunks of different features embed almost identically otherwise.
+    """
+    metas = [d.get("metadata") or {} for d in docs]
+    subjects = [(meta.get("type"), meta.get("feature_id")) for meta in metas]
+    return np.array([
+        [a[0] == b[0] and (a[1] is None or b[1] is None or str(a[1]) == str(b[1]))
+         for b in subjects]
+        for a in subjects
+    ], dtype=bool)
+
+
+def select_context(
+    query: str,
+    docs: list,
+    embedding_func=None,
+    token_budget: int = CONTEXT_TOKEN_BUDGET,
+    mmr_lambda: float = MMR_LAMBDA,
+    duplicate_similarity: float = NEAR_DUPLICATE_SIMILARITY
+) -> tuple:
+    """
+    Pick a diverse subset of retrieved chunks for a prompt: exact duplicates and
+    near-duplicates of a chosen chunk about the same feature are dropped, the
+    rest are chosen by maximal marginal relevance until token_budget (estimated
+    tokens) is spent. Chunk vectors come from the embedding cache they were
+    stored in at ingest time.
+    Returns (chosen docs in selection order, stats).
+    """
+    embedding_func = embedding_func or _default_embedding_func()
+    duplicates = over_budget = 0
+
+    unique, seen = [], set()
+    for doc in docs:
+        key = " ".join(doc["text"].lower().split())
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        unique.append(doc)
+
+    chosen = []
+    if unique:
+        vectors = _unit_rows(embedding_func([doc["text"] for doc in unique]))
+        relevance = vectors @ _unit_rows([embed_query(embedding_func, query)])[0]
+        similarity = vectors @ vectors.T
+        duplicate_of = np.where(_same_subject(unique), similarity, -1.0)
+        tokens = [estimate_tokens(doc["text"]) for doc in unique]
+        # Highest similarity of each candidate to any chosen chunk (any / same subject)
+        redundancy = np.zeros(len(unique), dtype=np.float32)
+        duplication = np.full(len(unique), -1.0, dtype=np.float32)
+        remaining, budget = list(range(len(unique))), token_budget
+        while remaining:
+            scores = mmr_lambda * relevance[remaining] - (1 - mmr_lambda) * redundancy[remaining]
+            best = remaining.pop(int(np.argmax(scores)))
+            if duplication[best] >= duplicate_similarity:
+                duplicates += 1
+                continue
+            if tokens[best] > budget:
+                over_budget += 1
+                continue
+            chosen.append(best)
+            budget -= tokens[best]
+            redundancy = np.maximum(redundancy, similarity[best])
+            duplication = np.maximum(duplication, duplicate_of[best])
+
+    selected = [unique[i] for i in chosen]
+    previous_tokens = estimate_tokens("\n\n".join(doc["text"] for doc in docs)[:PREVIOUS_CONTEXT_CHARS])
+    context_tokens = estimate_tokens("\n\n".join(doc["text"] for doc in selected))
+    stats = {
+        "candidates": len(docs),
+        "selected": len(selected),
+        "duplicates": duplicates,
+        "over_budget": over_budget,
+        "previous_tokens": previous_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": previous_tokens - context_tokens,
+    }
+    logger.info(
+        "Context selection kept %d of %d chunks (%d near-duplicates, %d over budget), "
+        "~%d tokens instead of ~%d",
+        stats["selected"], stats["candidates"], duplicates, over_budget,
+        context_tokens, previous_tokens
+    )
+    return selected, stats
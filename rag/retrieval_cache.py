@@ -0,0 +1,89 @@
+# rag/retrieval_cache.py
+# In-process LRU of query_vector_db results, keyed on (customer, query, n_results,
+# type filter, mode) and validated by the customer's vector version. Versions are
+# bumped by rag_engine after every vector write and reset by VectorStore.clear(),
+# so a cached retrieval is never served after that customer's chunks change.
+
+import os
+import threading
+from collections import OrderedDict
+
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "512"))
+
+
+class RetrievalCache:
+    """
+    Bounded LRU of retrieval results. An entry stores the version it was computed
+    at; after a bump it is never hit again and ages out like VersionedMemo entries.
+    Unfiltered (customer None) queries follow a version bumped by every write.
+    """
+
+    def __init__(self, max_entries: int = RETRIEVAL_CACHE_SIZE):
+        self.max_entries = max(1, max_entries)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._epoch = 0
+        self._versions = {}
+        self._any_version = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _version(self, customer_name) -> tuple:
+        if customer_name is None:
+            return self._epoch, self._any_version
+        return self._epoch, self._versions.get(customer_name, 0)
+
+    def bump(self, customers):
+        """Record that these customers' vectors changed"""
+        with self._lock:
+            for name in set(customers):
+                self._versions[name] = self._versions.get(name, 0) + 1
+            self._any_version += 1
+
+    def get_or_compute(self, customer_name, query: str, n_results: int, doc_type, mode: str, compute) -> list:
+        key = (customer_name, query, n_results, doc_type, mode)
+        with self._lock:
+            version = self._version(customer_name)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [dict(r) for r in entry[1]]
+            self.misses += 1
+
+        # Computed outside the lock; a write during compute leaves this entry stale, never wrong
+        results = compute()
+        with self._lock:
+            self._entries[key] = (version, [dict(r) for r in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return results
+
+    def clear(self):
+        """Drop every entry; results computed before the clear are not stored"""
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+
+_cache = RetrievalCache()
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Process-wide retrieval cache shared by every Streamlit session"""
+    return _cache
@@ -0,0 +1,256 @@
+# rag/vector_shards.py
+# Optional partitioning of the vector collection: one Chroma collection per
+# customer ("customer") or per hash bucket of customers ("bucket"), so a
+# customer-filtered query searches only that customer's graph. ShardedCollection
+# routes the Collection calls rag_engine makes; main() splits an existing
+# single collection into shards.
+#
+#   python -m rag.vector_shards [--mode customer|bucket] [--dry-run] [--drop-source]
+
+import os
+import re
+import hashlib
+import argparse
+import threading
+
+# "none" (one collection), "customer" or "bucket"
+VECTOR_SHARDING = os.getenv("VECTOR_SHARDING", "none").lower()
+VECTOR_SHARD_BUCKETS = int(os.getenv("VECTOR_SHARD_BUCKETS", "16"))
+SHARDING_MODES = ("none", "customer", "bucket")
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def shard_prefix(base_name: str) -> str:
+    """Name prefix shared by all shards of base_name (".": model suffixes use "__")"""
+    # Chroma names are at most 63 characters; keys below add at most 35
+    if len(base_name) > 27:
+        base_name = f"{base_name[:20]}-{_digest(base_name)[:6]}"
+    return f"{base_name}."
+
+
+def shard_key(customer_name, mode: str, buckets: int = VECTOR_SHARD_BUCKETS) -> str:
+    """Shard suffix for a customer; chunks without a customer share one shard"""
+    if customer_name is None:
+        return "shared"
+    customer_name = str(customer_name)
+    if mode == "bucket":
+        return f"b{int(_digest(customer_name), 16) % buckets:03d}"
+    if mode == "customer":
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', customer_name).strip('-').lower()[:24]
+        # The hash keeps customers whose names slug the same apart
+        return f"c-{slug}-{_digest(customer_name)[:8]}" if slug else f"c-{_digest(customer_name)[:8]}"
+    raise ValueError(f"Unknown VECTOR_SHARDING '{mode}' (expected one of {', '.join(SHARDING_MODES)})")
+
+
+def _collection_names(client) -> list:
+    # list_collections() returns Collection objects in 0.4/0.5 and names in 0.6+
+    return [getattr(c, "name", c) for c in client.list_collections()]
+
+
+def _split_customer(where: dict) -> tuple:
+    """(customer_name, the rest of where) for {"customer_name": ...} or an "$and" of clauses"""
+    if not where:
+        return None, where
+    if isinstance(where.get("customer_name"), str):
+        return where["customer_name"], {k: v for k, v in where.items() if k != "customer_name"} or None
+    clauses = where.get("$and")
+    if len(where) == 1 and clauses:
+        for clause in clauses:
+            if set(clause) == {"customer_name"} and isinstance(clause["customer_name"], str):
+                rest = [c for c in clauses if c is not clause]
+                return clause["customer_name"], (rest[0] if len(rest) == 1 else {"$and": rest})
+    return None, where
+
+
+def _empty_query_result(include) -> dict:
+    result = {"ids": [[]]}
+    for field in include or ["documents", "metadatas", "distances"]:
+        result[field] = [[]]
+    return result
+
+
+class ShardedCollection:
+    """
+    The subset of the Chroma Collection API used by rag_engine (add, upsert,
+    query, get, count), routed over shard collections by customer_name.
+    """
+
+    def __init__(self, client, embedding_func, base_name: str,
+                 mode: str = VECTOR_SHARDING, buckets: int = VECTOR_SHARD_BUCKETS):
+        if mode not in ("customer", "bucket"):
+            raise ValueError(f"ShardedCollection needs mode 'customer' or 'bucket', not '{mode}'")
+        self.client = client
+        self.embedding_func = embedding_func
+        self.mode = mode
+        self.buckets = buckets
+        self.prefix = shard_prefix(base_name)
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def shard_name(self, customer_name) -> str:
+        return self.prefix + shard_key(customer_name, self.mode, self.buckets)
+
+    def shard_names(self) -> list:
+        return sorted(n for n in _collection_names(self.client) if n.startswith(self.prefix))
+
+    def _shard(self, name: str, create: bool):
+        """Shard collection by name; None if it does not exist and create is False"""
+        with self._lock:
+            if name not in self._collections:
+                if not create and name not in self.shard_names():
+                    return None
+                self._collections[name] = self.client.get_or_create_collection(
+                    name=name, embedding_function=self.embedding_func
+                )
+            return self._collections[name]
+
+    def _write(self, method: str, documents, metadatas, ids, embeddings=None):
+        # Embed the whole batch once, then write each shard's part
+        if embeddings is None:
+            embeddings = self.embedding_func(list(documents))
+        groups = {}
+        for i, meta in enumerate(metadatas):
+            groups.setdefault(self.shard_name((meta or {}).get("customer_name")), []).append(i)
+        for name, rows in groups.items():
+            getattr(self._shard(name, create=True), method)(
+                documents=[documents[i] for i in rows],
+                metadatas=[metadatas[i] for i in rows],
+                ids=[ids[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows],
+            )
+
+    def add(self, documents, metadatas, ids, embeddings=None):
+        self._write("add", documents, metadatas, ids, embeddings)
+
+    def upsert(self, documents, metadatas, ids, embeddings=None):
+        self._write("upsert", documents, metadatas, ids, embeddings)
+
+    def count(self) -> int:
+        return sum(self._shard(name, create=False).count() for name in self.shard_names())
+
+    def query(self, query_embeddings, n_results: int = 10, where: dict = None, include: list = None):
+        include = list(include or ["documents", "metadatas", "distances"])
+        customer, rest = _split_customer(where)
+        if customer is not None:
+            shard = self._shard(self.shard_name(customer), create=False)
+            if shard is None:
+                return _empty_query_result(include)
+            if self.mode == "customer":
+                # Every chunk in the shard belongs to this customer
+                where = rest
+            return shard.query(query_embeddings=query_embeddings, n_results=n_results, where=where, include=include)
+
+        # No single customer: ask every shard and merge by distance
+        fields = [f for f in include if f != "distances"]
+        hits = []
+        for name in self.shard_names():
+            result = self._shard(name, create=False).query(
+                query_embeddings=query_embeddings, n_results=n_results, where=where,
+                include=[*fields, "distances"]
+            )
+            for pos, doc_id in enumerate(result["ids"][0]):
+                hits.append((result["distances"][0][pos], doc_id, {f: result[f][0][pos] for f in fields}))
+        hits.sort(key=lambda hit: hit[0])
+        hits = hits[:n_results]
+        merged = {"ids": [[doc_id for _, doc_id, _ in hits]]}
+        for field in fields:
+            merged[field] = [[values[field] for _, _, values in hits]]
+        if "distances" in include:
+            merged["distances"] = [[distance for distance, _, _ in hits]]
+        return merged
+
+    def get(self, include: list = None, limit: int = None, offset: int = 0):
+        """Page through all shards in name order, as if they were one collection"""
+        include = list(include or ["documents", "metadatas"])
+        page = {"ids": [], **{field: [] for field in include}}
+        for name in self.shard_names():
+            if limit is not None and len(page["ids"]) >= limit:
+                break
+            shard = self._shard(name, create=False)
+            size = shard.count()
+            if offset >= size:
+                offset -= size
+                continue
+            want = None if limit is None else limit - len(page["ids"])
+            part = shard.get(include=include, limit=want, offset=offset)
+            offset = 0
+            page["ids"].extend(part["ids"])
+            for field in include:
+                page[field].extend(part[field])
+        return page
+
+
+def split_collection(source, target: ShardedCollection, page_size: int = 500) -> dict:
+    """
+    Copy every chunk of source into target's shards with its stored embedding
+    (nothing is re-embedded). Upserts, so an interrupted split can be rerun.
+    Returns {shard name: chunks copied}.
+    """
+    copied, offset = {}, 0
+    while True:
+        page = source.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+        if not len(page["ids"]):
+            return copied
+        target.upsert(page["documents"], page["metadatas"], page["ids"], embeddings=list(page["embeddings"]))
+        for meta in page["metadatas"]:
+            name = target.shard_name((meta or {}).get("customer_name"))
+            copied[name] = copied.get(name, 0) + 1
+        offset += len(page["ids"])
+
+
+def main(argv=None):
+    from rag.rag_engine import get_vector_store
+
+    parser = argparse.ArgumentParser(description="Split the single vector collection into shards")
+    parser.add_argument("--mode", choices=["customer", "bucket"],
+                        default=VECTOR_SHARDING if VECTOR_SHARDING != "none" else "customer")
+    parser.add_argument("--buckets", type=int, default=VECTOR_SHARD_BUCKETS)
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="only report the shard sizes")
+    parser.add_argument("--drop-source", action="store_true",
+                        help="delete the single collection once every chunk is in a shard")
+    args = parser.parse_args(argv)
+
+    store = get_vector_store()
+    source = store.unsharded_collection
+    target = ShardedCollection(store.client, store.embedding_func, source.name, args.mode, args.buckets)
+    total = source.count()
+
+    if args.dry_run:
+        sizes, offset = {}, 0
+        while offset < total:
+            page = source.get(include=["metadatas"], limit=args.page_size, offset=offset)
+            if not len(page["ids"]):
+                break
+            for meta in page["metadatas"]:
+                name = target.shard_name((meta or {}).get("customer_name"))
+                sizes[name] = sizes.get(name, 0) + 1
+            offset += len(page["ids"])
+    else:
+        sizes = split_collection(source, target, args.page_size)
+
+    for name, size in sorted(sizes.items()):
+        print(f"{name:<63} {size:>8,}")
+    print(f"{total:,} chunks in '{source.name}' -> {len(sizes)} {args.mode} shards"
+          + (" (dry run)" if args.dry_run else ""))
+    if args.dry_run:
+        return 0
+
+    sharded = target.count()
+    if sharded < total:
+        print(f"Only {sharded:,} of {total:,} chunks are in shards; keeping '{source.name}'")
+        return 1
+    if args.drop_source:
+        store.client.delete_collection(source.name)
+        print(f"Deleted '{source.name}'")
+    print(f"Set VECTOR_SHARDING={args.mode}"
+          + (f" and VECTOR_SHARD_BUCKETS={args.buckets}" if args.mode == "bucket" else "")
+          + " to query the shards")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
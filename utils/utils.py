@@ -1,7 +1,21 @@
 # automated_sales_enablement/utils/utils.py
 
+# Release status precedence shared by the comparator and the DB layer:
+# any "released"-like status beats "planned", which beats everything else.
+RELEASED_STATUSES = ["released", "done", "completed", "yes", "true"]
+STATUS_LABELS = ["Missing", "Planned", "Released"]  # indexed by status rank
+
 def normalize_text(text):
     return text.lower().strip()
 
 def chunk_text(text, chunk_size=500):
-    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
\ No newline at end of file
+    return [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+
+def release_status_rank(status) -> int:
+    """0 = Missing, 1 = Planned, 2 = Released (see STATUS_LABELS)"""
+    clean = str(status).strip().lower()
+    if clean in RELEASED_STATUSES:
+        return 2
+    if clean == "planned":
+        return 1
+    return 0